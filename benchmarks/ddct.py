@@ -0,0 +1,230 @@
+"""
+This module benchmarks the end-to-end Delta-Delta-Ct analysis (`core.run_ddCt`).
+
+It generates synthetic assays and normalisers, stores them in a headless session (just like `core.read`
+would) and runs the full analysis for each combination of normalisation mode (pair-wise, combinatoric, permutative),
+filter (None, Range, IQR) and calibration (on or off). Starting from a base experiment, each of the
+dimensions (number of assays, normalisers, groups and replicates) is scaled up one at a time, which produces
+scaling curves of time and memory vs. the size of the dimension.
+
+The scaling of each curve is estimated by the slope of its log-log curve (i.e. the exponent `b` in `time ~ size ** b`).
+Curves that scale super-linearly (e.g. the combinatoric normalisation vs. the number of replicates) are flagged.
+
+Note
+----
+The stage graph is reset before each run, so each run computes all stages anew.
+
+Usage
+-----
+python benchmarks/ddct.py --output ddct.json
+python benchmarks/ddct.py --modes combinatoric --axes normalisers replicates --scales 1 2 4 8 16
+"""
+
+import sys
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+import harness
+import qpcr
+import qpcr.defaults as defaults
+import core
+import snapshot
+
+
+modes = ("pair-wise", "combinatoric", "permutative")
+filters = ("None", "Range", "IQR")
+axes = ("assays", "normalisers", "groups", "replicates")
+
+# the dimensions of the base experiment that is scaled up
+base = dict(assays=4, normalisers=2, groups=4, replicates=3)
+
+# the dilution steps of the calibrator replicates (if calibrating)
+dilutions = (1, 0.5, 0.25, 0.125)
+
+
+def make_assay(name, groups, replicates, rng, calibrators=False):
+    """
+    Generates a synthetic qpcr.Assay.
+
+    Parameters
+    ----------
+    name : str
+        The assay id.
+    groups : int
+        The number of replicate groups.
+    replicates : int
+        The number of replicates per group.
+    rng : np.random.Generator
+        The random number generator to use.
+    calibrators : bool
+        Add groups of calibrator replicates of a dilution series (for calibration).
+
+    Returns
+    -------
+    assay : qpcr.Assay
+        The assay.
+    """
+    ids = [f"group{i}" for i in range(groups) for _ in range(replicates)]
+    cts = list(rng.normal(rng.uniform(18, 30), 0.5, len(ids)))
+
+    # calibrator Cts increase by one cycle per two-fold dilution. The replicates of each step are
+    # spread evenly, so that no filter removes any of them (calibrator replicates that were filtered out
+    # are not removed after the calibration, which would leave the assays of unequal size)
+    if calibrators:
+        start = rng.uniform(18, 24)
+        spread = np.linspace(-0.1, 0.1, replicates)
+        for dilution in dilutions:
+            ids.extend([f"calibrator: dilution: {dilution}"] * replicates)
+            cts.extend(start - np.log2(dilution) + rng.normal(0, 0.1) + spread)
+
+    id_col, ct_col = defaults.raw_col_names
+    df = pd.DataFrame({id_col: ids, ct_col: cts})
+    assay = qpcr.Assay(df, id=name, replicates=replicates)
+    return assay
+
+
+def make_experiment(assays, normalisers, groups, replicates, rng, calibrators=False):
+    """
+    Generates the synthetic assays and normalisers of an experiment.
+
+    Returns
+    -------
+    assays : list
+        The assays.
+    normalisers : list
+        The normalisers.
+    """
+    new_assays = [make_assay(f"assay{i}", groups, replicates, rng, calibrators) for i in range(assays)]
+    new_normalisers = [make_assay(f"normaliser{i}", groups, replicates, rng, calibrators) for i in range(normalisers)]
+    return new_assays, new_normalisers
+
+
+def analysis_settings(mode, filter_type, calibrate, k=1):
+    """
+    Gets the session settings of an analysis (with the defaults of the app's controls).
+
+    Returns
+    -------
+    settings : dict
+        The session settings.
+    """
+    filter_type = None if filter_type == "None" else filter_type
+    inclusion_range = (-1.0, 1.0) if filter_type == "Range" else (-1.5, 1.5)
+
+    settings = dict(
+        filter_type=filter_type,
+        inclusion_range=inclusion_range if filter_type is not None else None,
+        chart_mode="static",
+        perform_calibration=calibrate,
+        efficiency_reference_file=None,
+        use_efficiency_store=False,
+        calibration_dilution=None,
+        remove_calibrators=True,
+        ignore_uncalibratable=True,
+        anchor="grouped",
+        ref_group=None,
+        normalisation_mode=mode,
+        permutate_stack=k if mode == "permutative" else None,
+        permutate_replace=False if mode == "permutative" else None,
+        drop_rel=False,
+        perform_stats_tests=False,
+        workers=None,
+    )
+    return settings
+
+
+def cases(modes, filters, calibrations, axes, scales):
+    """
+    Generates the benchmark cases.
+
+    Yields
+    -------
+    case : dict
+        The analysis settings (mode, filter, calibrate), the scaled axis,
+        and the dimensions of the experiment.
+    """
+    for mode in modes:
+        for filter_type in filters:
+            for calibrate in calibrations:
+                for axis in axes:
+                    for scale in scales:
+                        dims = dict(base)
+                        dims[axis] *= scale
+                        yield dict(mode=mode, filter=filter_type, calibrate=calibrate, axis=axis, size=dims[axis], **dims)
+
+
+def analyse(state):
+    """
+    Runs the Delta-Delta-Ct analysis of a headless session and checks that it produced results.
+    """
+    core.run_ddCt()
+
+    results = state.get("results")
+    if results is None or len(results.get()) == 0 or len(results.data_cols) == 0:
+        raise ValueError("The analysis produced no results.")
+
+
+def run(modes=modes, filters=filters, calibrations=(False, True), axes=axes, scales=(1, 2, 4, 8), k=1, repeat=3, seed=0):
+    """
+    Runs the Delta-Delta-Ct benchmarks.
+
+    Returns
+    -------
+    results : list
+        The results of each case (see `harness.run_case`).
+    """
+    rng = np.random.default_rng(seed)
+    results = []
+
+    for case in cases(modes, filters, calibrations, axes, scales):
+        dims = {i: case[i] for i in base}
+        assays, normalisers = make_experiment(**dims, rng=rng, calibrators=case["calibrate"])
+
+        store = snapshot.RawStore()
+        store.set(assays, normalisers)
+
+        settings = analysis_settings(case["mode"], case["filter"], case["calibrate"], k=k)
+        settings.update(raw_store=store, assays=assays, normalisers=normalisers)
+
+        values = sum(len(i.get()) for i in assays + normalisers)
+
+        with harness.headless_session(settings) as state:
+            result = harness.run_case(
+                "run_ddCt",
+                partial(analyse, state),
+                setup=lambda: state.pop("stage_graph", None),
+                repeat=repeat,
+                items=values,
+                values=values,
+                **case,
+            )
+        results.append(result)
+
+    return results
+
+
+def main(argv=None):
+    parser = harness.argument_parser("Benchmark the Delta-Delta-Ct analysis on synthetic experiments of increasing size.")
+    parser.add_argument("-m", "--modes", nargs="+", choices=modes, default=list(modes), help="The normalisation modes to benchmark (default is all).")
+    parser.add_argument("-f", "--filters", nargs="+", choices=filters, default=list(filters), help="The filters to benchmark (default is all).")
+    parser.add_argument("--calibrate", nargs="+", choices=("off", "on"), default=["off", "on"], help="Benchmark with and/or without calibration (default is both).")
+    parser.add_argument("-a", "--axes", nargs="+", choices=axes, default=list(axes), help="The dimensions of the experiment to scale up (default is all).")
+    parser.add_argument("-s", "--scales", type=int, nargs="+", default=[1, 2, 4, 8], help="The factors by which to scale up the base experiment (default is 1 2 4 8).")
+    parser.add_argument("-k", "--permutations", type=int, default=1, help="The number of permutations for permutative normalisation (default is 1).")
+    parser.add_argument("-t", "--threshold", type=float, default=1.2, help="The log-log slope above which scaling is flagged as super-linear (default is 1.2).")
+    parser.add_argument("--seed", type=int, default=0, help="The seed for the random Ct values.")
+    args = parser.parse_args(argv)
+
+    calibrations = [i == "on" for i in args.calibrate]
+    results = run(args.modes, args.filters, calibrations, args.axes, args.scales, k=args.permutations, repeat=args.repeat, seed=args.seed)
+
+    curves = harness.scaling_curves(results, x="size", by=["mode", "filter", "calibrate", "axis"], threshold=args.threshold)
+    failed = harness.report("ddct", results, output=args.output, compare=args.compare, curves=curves)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""
+This module defines the shared harness of Qupid's benchmark suites.
+
+It makes the app's modules (in `src`) importable, provides an in-memory stand-in for the streamlit
+`UploadedFile` objects and a headless session, and measures the wall time, peak memory and throughput
+of a benchmark case. The results of a suite are printed as a table and can be saved as JSON,
+so that two runs (e.g. before and after a change) can be compared.
+
+Note
+----
+Timing and memory are measured in separate runs, since tracing the memory allocations
+slows down the code considerably.
+"""
+
+import argparse
+import gc
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from io import BytesIO
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(root, "src"))
+
+import Qupid as qu
+
+# the keys of a result that hold its measurement (rather than the case's parameters)
+measures = ("wall_best", "wall_mean", "peak_mb", "items", "items_per_s", "mb_per_s", "error")
+
+
+class MemoryFile(BytesIO):
+    """
+    An in-memory file that stands in for a streamlit `UploadedFile`.
+
+    Parameters
+    ----------
+    data : bytes
+        The file contents.
+    name : str
+        The filename (the suffix determines how the file is read).
+    """
+
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+        self.size = len(data)
+
+    def __repr__(self):
+        return f"MemoryFile(name='{self.name}', size={self.size})"
+
+
+@contextmanager
+def headless_session(settings):
+    """
+    Runs the enclosed code with a plain dictionary as session (instead of the streamlit session).
+
+    Parameters
+    ----------
+    settings : dict
+        The session settings.
+    """
+    state = dict(settings)
+    qu.use_session_state(state)
+    try:
+        yield state
+    finally:
+        qu.use_session_state(None)
+
+
+def measure(func, setup=None, repeat=3, items=None, nbytes=None):
+    """
+    Measures the wall time and peak memory of a function.
+
+    Parameters
+    ----------
+    func : callable
+        The function to measure.
+    setup : callable
+        A function that prepares each single run (e.g. clears caches).
+        Its runtime is not measured.
+    repeat : int
+        The number of timed runs.
+    items : int
+        The number of processed items (e.g. rows or Ct values) per run to compute the throughput.
+    nbytes : int
+        The number of processed bytes per run to compute the throughput.
+
+    Returns
+    -------
+    measurement : dict
+        The best and mean wall time (in seconds), the peak memory (in MB)
+        and the throughput (items per second and MB per second) of the best run.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    # memory is measured in a separate, untimed run
+    if setup is not None:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    best = min(times)
+    measurement = dict(
+        wall_best=best,
+        wall_mean=sum(times) / len(times),
+        peak_mb=peak / 1024 ** 2,
+        items=items,
+        items_per_s=items / best if items and best > 0 else None,
+        mb_per_s=nbytes / 1024 ** 2 / best if nbytes and best > 0 else None,
+    )
+    return measurement
+
+
+def run_case(name, func, setup=None, repeat=3, items=None, nbytes=None, **params):
+    """
+    Runs a single benchmark case and records any errors (including `st.stop`) instead of raising them.
+    A suite with failed cases should exit with an error (see `report`).
+
+    Parameters
+    ----------
+    name : str
+        The name of the case.
+    func : callable
+        The function to measure (see `measure`).
+    **params
+        Any parameters describing the case (these are included in the result).
+
+    Returns
+    -------
+    result : dict
+        The case name, its parameters, and its measurement (or an error message).
+    """
+    result = dict(case=name, **params)
+    try:
+        result.update(measure(func, setup=setup, repeat=repeat, items=items, nbytes=nbytes))
+        result["error"] = None
+
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+
+    # streamlit signals st.stop() through an exception that is not derived from Exception
+    # (which is recorded as well since it follows an error message), anything else is raised
+    except BaseException as e:
+        if type(e).__name__ != "StopException":
+            raise
+        result["error"] = f"{type(e).__name__}: st.stop() was called"
+    return result
+
+
+def metadata():
+    """
+    Returns
+    -------
+    metadata : dict
+        Information on the environment a benchmark suite was run in.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+
+    versions = {}
+    for module in ("numpy", "pandas", "qpcr", "streamlit"):
+        versions[module] = getattr(sys.modules.get(module), "__version__", None)
+
+    return dict(
+        date=datetime.now().isoformat(timespec="seconds"),
+        commit=commit or None,
+        python=platform.python_version(),
+        platform=platform.platform(),
+        cpus=os.cpu_count(),
+        versions=versions,
+    )
+
+
+def scaling_curves(results, x, by, threshold=1.2):
+    """
+    Assembles scaling curves (time and memory vs. size) from the results of a benchmark suite.
+
+    The scaling behaviour of each curve is estimated as the slope of a straight
+    line fitted to the log-log curve (i.e. the exponent `b` of `time ~ size ** b`).
+
+    Parameters
+    ----------
+    results : list
+        The results of each case (see `run_case`).
+    x : str
+        The parameter of the cases that holds the size.
+    by : list
+        The parameters of the cases that identify a curve.
+    threshold : float
+        The slope above which a curve is flagged as super-linear.
+
+    Returns
+    -------
+    curves : list
+        A dictionary for each curve, holding its parameters, the sizes, times and peak memory,
+        the slopes of time and memory, and whether it scales super-linearly.
+    """
+    curves = {}
+    for result in results:
+        if result["error"] is not None:
+            continue
+        key = tuple(result[i] for i in by)
+        curves.setdefault(key, []).append(result)
+
+    assembled = []
+    for key, points in curves.items():
+        points = sorted(points, key=lambda i: i[x])
+        sizes = [i[x] for i in points]
+        times = [i["wall_best"] for i in points]
+        peaks = [i["peak_mb"] for i in points]
+
+        time_slope = loglog_slope(sizes, times)
+        memory_slope = loglog_slope(sizes, peaks)
+        superlinear = any(i is not None and i > threshold for i in (time_slope, memory_slope))
+
+        curve = dict(zip(by, key))
+        curve.update(x=x, sizes=sizes, times=times, peaks=peaks, time_slope=time_slope, memory_slope=memory_slope, superlinear=superlinear)
+        assembled.append(curve)
+
+    return assembled
+
+
+def loglog_slope(xs, ys):
+    """
+    Fits a straight line to the log-log curve of ys vs. xs.
+
+    Returns
+    -------
+    slope : float
+        The slope of the line (or None if there are fewer than two valid points).
+    """
+    points = [(math.log(i), math.log(j)) for i, j in zip(xs, ys) if i > 0 and j > 0]
+    if len(set(i for i, _ in points)) < 2:
+        return None
+
+    mean_x = sum(i for i, _ in points) / len(points)
+    mean_y = sum(j for _, j in points) / len(points)
+    cov = sum((i - mean_x) * (j - mean_y) for i, j in points)
+    var = sum((i - mean_x) ** 2 for i, _ in points)
+    return cov / var
+
+
+def report(suite, results, output=None, compare=None, curves=None):
+    """
+    Prints the results of a benchmark suite and (optionally) saves them as JSON.
+
+    Parameters
+    ----------
+    suite : str
+        The name of the benchmark suite.
+    results : list
+        The results of each case (see `run_case`).
+    output : str
+        The path of a JSON file to save the results to.
+    compare : str
+        The path of a JSON file of a previous run to compare the results to.
+    curves : list
+        Any scaling curves of the results (see `scaling_curves`).
+
+    Returns
+    -------
+    failed : int
+        The number of failed cases (a suite should exit with an error if any cases failed).
+    """
+    baseline = {}
+    if compare is not None:
+        with open(compare, "r") as f:
+            baseline = {_case_id(i): i for i in json.load(f)["results"]}
+
+    for result in results:
+        print(_format_result(result, baseline.get(_case_id(result))))
+
+    if curves:
+        print("\nScaling (log-log slopes of time and memory vs. size)")
+        for curve in curves:
+            print(_format_curve(curve))
+
+    if output is not None:
+        content = dict(suite=suite, metadata=metadata(), results=results)
+        if curves is not None:
+            content["curves"] = curves
+        with open(output, "w") as f:
+            json.dump(content, f, indent=2)
+        print(f"\nResults saved to {output}")
+
+    failed = sum(i["error"] is not None for i in results)
+    if failed:
+        print(f"\n{failed} of {len(results)} cases failed")
+    return failed
+
+
+def argument_parser(description):
+    """
+    Sets up the command line arguments that are shared by all benchmark suites.
+
+    Returns
+    -------
+    parser : argparse.ArgumentParser
+        The argument parser.
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="The number of timed runs per case (default is 3).")
+    parser.add_argument("-o", "--output", default=None, help="Save the results to a JSON file.")
+    parser.add_argument("-c", "--compare", default=None, help="Compare the results to those of a previous run (a JSON file).")
+    return parser
+
+
+def _case_id(result):
+    """
+    Identifies a case by its name and parameters (i.e. anything but its measurement).
+    """
+    params = sorted((i, repr(j)) for i, j in result.items() if i not in measures)
+    return tuple(params)
+
+
+def _format_result(result, baseline=None):
+    """
+    Formats a single result as a line of text (with the relative change to the baseline, if given).
+    """
+    params = " ".join(f"{i}={j}" for i, j in result.items() if i not in measures and i != "case")
+    line = f"{result['case']:<16} {params:<48}"
+
+    if result["error"] is not None:
+        return f"{line} ERROR {result['error']}"
+
+    line += f" {result['wall_best'] * 1000:>10.1f} ms {result['peak_mb']:>9.1f} MB"
+    if result["items_per_s"] is not None:
+        line += f" {result['items_per_s']:>12.0f} items/s"
+
+    if baseline is not None and baseline.get("error") is None:
+        line += f"  ({_change(result['wall_best'], baseline['wall_best'])} time, {_change(result['peak_mb'], baseline['peak_mb'])} memory)"
+    return line
+
+
+def _format_curve(curve):
+    """
+    Formats a single scaling curve as a line of text.
+    """
+    params = " ".join(f"{i}={j}" for i, j in curve.items() if i not in ("x", "sizes", "times", "peaks", "time_slope", "memory_slope", "superlinear"))
+    slopes = " ".join("  n/a" if i is None else f"{i:5.2f}" for i in (curve["time_slope"], curve["memory_slope"]))
+    flag = "  SUPER-LINEAR" if curve["superlinear"] else ""
+    return f"{params:<64} vs. {curve['x']:<12} {slopes}{flag}"
+
+
+def _change(new, old):
+    """
+    Formats the relative change of a measure.
+    """
+    if not old:
+        return "n/a"
+    return f"{(new - old) / old:+.0%}"
+
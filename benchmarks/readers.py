@@ -0,0 +1,374 @@
+"""
+This module benchmarks the main reading methods of the QupidReader.
+
+It generates synthetic (decorated) datafiles in memory, feeds them through the main reading
+methods using in-memory stand-ins for streamlit's `UploadedFile`, and reports the wall time,
+peak memory and throughput (Ct values per second) of each case.
+
+The following layouts are covered (each as `csv` and `xlsx` file, unless noted otherwise):
+
+regular                     A regular single-assay file (SingleReader_read_regular)
+multi_assay                 A decorated multi-assay file, transposed or not (MultiReader_read)
+multi_sheet                 A decorated multi-assay file with multiple sheets, transposed or not (MultiSheetReader_read, `xlsx` only)
+vertical                    A decorated vertical big table (BigTableReader_read)
+horizontal                  A decorated horizontal big table (BigTableReader_read)
+hybrid                      A decorated hybrid big table (BigTableReader_read)
+
+The size of a case is the (approximate) total number of Ct values in the file.
+Note, the read cache is cleared before each run, so each run reads the file anew.
+
+Usage
+-----
+python benchmarks/readers.py --sizes 1 100 10000 1000000 --output readers.json
+python benchmarks/readers.py --layouts vertical --formats csv --compare readers.json
+"""
+
+import csv
+import io
+import sys
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+import harness
+import Qupid as qu
+
+
+layouts = ("regular", "multi_assay", "multi_sheet", "vertical", "horizontal", "hybrid")
+formats = ("csv", "xlsx")
+
+# the column headers used in the generated files
+id_col, ct_col, assay_col = "Name", "Ct", "Assay"
+
+# the default number of replicates per group
+replicates = 3
+
+
+def make_cts(n, rng):
+    """
+    Generates random Ct values.
+
+    Parameters
+    ----------
+    n : int
+        The number of Ct values.
+    rng : np.random.Generator
+        The random number generator to use.
+
+    Returns
+    -------
+    cts : list
+        A list of Ct values (rounded to three decimals).
+    """
+    return np.round(rng.uniform(15, 35, n), 3).tolist()
+
+
+def make_ids(rows, reps):
+    """
+    Generates replicate identifiers of consecutive groups of replicates.
+
+    Returns
+    -------
+    ids : list
+        A list of identifiers (`group0, group0, group0, group1, ...`).
+    """
+    return [f"group{i // reps}" for i in range(rows)]
+
+
+def decorator(index):
+    """
+    Returns
+    -------
+    decorator : str
+        Every fourth assay is decorated as normaliser, all others as assays.
+    """
+    return "normaliser" if index % 4 == 3 else "assay"
+
+
+def assay_shape(size, assays):
+    """
+    Gets the number of rows and replicates per assay for a file of a given size.
+
+    Returns
+    -------
+    rows : int
+        The number of rows per assay (a multiple of the replicates).
+    reps : int
+        The number of replicates per group.
+    """
+    rows = max(1, size // assays)
+    reps = min(replicates, rows)
+    rows -= rows % reps
+    return rows, reps
+
+
+def regular_grid(size, rng, **kwargs):
+    """
+    Generates a regular single-assay file.
+
+    Returns
+    -------
+    sheets : list
+        The grid (a list of rows) of each sheet.
+    settings : dict
+        The session settings required to read the file.
+    values : int
+        The number of Ct values in the file.
+    """
+    rows, reps = assay_shape(size, 1)
+    grid = [[id_col, ct_col]]
+    grid.extend(zip(make_ids(rows, reps), make_cts(rows, rng)))
+    return [grid], dict(replicates=reps), rows
+
+
+def multi_assay_grid(size, rng, assays=4, transpose=False, **kwargs):
+    """
+    Generates a decorated multi-assay file, where the assays are located one below the other
+    (or next to one another if transposed).
+
+    Each assay's name is directly below its decorator. If not transposed, the decorators and names are
+    in the first column and the data columns are next to them (so they end at the next decorator).
+    If transposed, the decorators are in one row and the data columns are below the names.
+    The first row holds a title, since the QupidReader reads the first row as a header.
+    """
+    rows, reps = assay_shape(size, assays)
+
+    grid = [["Multi-assay benchmark"]]
+    blocks = []
+    for a in range(assays):
+        data = list(zip(make_ids(rows, reps), make_cts(rows, rng)))
+        if transpose:
+            block = [[f"@qpcr:{decorator(a)}", None], [f"assay{a}", None], [id_col, ct_col], *data]
+            blocks.append(block)
+        else:
+            grid.extend([[f"@qpcr:{decorator(a)}"], [f"assay{a}"], [None, id_col, ct_col]])
+            grid.extend([None, *i] for i in data)
+            grid.append([])
+
+    # transposed assays are separated by an empty column
+    if transpose:
+        grid.extend([cell for block_row in row for cell in (*block_row, None)] for row in zip(*blocks))
+
+    settings = dict(replicates=reps, transpose=transpose)
+    return [grid], settings, rows * assays
+
+
+def multi_sheet_grid(size, rng, sheets=3, assays=4, transpose=False, **kwargs):
+    """
+    Generates a decorated multi-assay file with multiple sheets.
+    """
+    grids = []
+    values = 0
+    for _ in range(sheets):
+        grid, settings, n = multi_assay_grid(max(1, size // sheets), rng, assays=assays, transpose=transpose)
+        grids.extend(grid)
+        values += n
+
+    settings.update(multi_sheet=True)
+    return grids, settings, values
+
+
+def vertical_grid(size, rng, assays=8, **kwargs):
+    """
+    Generates a decorated vertical big table.
+    """
+    rows, reps = assay_shape(size, assays)
+
+    grid = [[id_col, ct_col, assay_col, "@qpcr"]]
+    for a in range(assays):
+        ids, cts = make_ids(rows, reps), make_cts(rows, rng)
+        grid.extend([i, j, f"assay{a}", decorator(a)] for i, j in zip(ids, cts))
+
+    settings = dict(replicates=reps, kind="vertical")
+    return [grid], settings, rows * assays
+
+
+def horizontal_grid(size, rng, groups=4, **kwargs):
+    """
+    Generates a decorated horizontal big table, where each row holds
+    the replicates of all groups of an assay side-by-side.
+    """
+    width = groups * replicates
+    assays = max(1, size // width)
+
+    header = [assay_col] + [f"group{g}" for g in range(groups) for _ in range(replicates)] + ["@qpcr"]
+    decorators = [""] + ["@qpcr:group" if i % replicates == 0 else "" for i in range(width)] + [""]
+
+    grid = [decorators, header]
+    for a in range(assays):
+        grid.append([f"assay{a}"] + make_cts(width, rng) + [decorator(a)])
+
+    settings = dict(replicates=replicates, kind="horizontal")
+    return [grid], settings, assays * width
+
+
+def hybrid_grid(size, rng, assays=4, **kwargs):
+    """
+    Generates a decorated hybrid big table, where each column holds the Ct values of an assay.
+    """
+    rows, reps = assay_shape(size, assays)
+
+    decorators = [""] + [f"@qpcr:{decorator(a)}" for a in range(assays)]
+    header = [id_col] + [f"assay{a}" for a in range(assays)]
+    cts = [make_cts(rows, rng) for _ in range(assays)]
+
+    grid = [decorators, header]
+    grid.extend([i, *j] for i, j in zip(make_ids(rows, reps), zip(*cts)))
+
+    settings = dict(replicates=reps, kind="hybrid")
+    return [grid], settings, rows * assays
+
+
+generators = {
+    "regular": regular_grid,
+    "multi_assay": multi_assay_grid,
+    "multi_sheet": multi_sheet_grid,
+    "vertical": vertical_grid,
+    "horizontal": horizontal_grid,
+    "hybrid": hybrid_grid,
+}
+
+
+def to_file(sheets, fmt, name):
+    """
+    Writes the grids of a file into an in-memory file.
+
+    Parameters
+    ----------
+    sheets : list
+        The grid (a list of rows) of each sheet.
+    fmt : str
+        The file format (`csv` or `xlsx`). Csv files only hold the first sheet.
+    name : str
+        The filename (without suffix).
+
+    Returns
+    -------
+    file : harness.MemoryFile
+        The in-memory file.
+    """
+    if fmt == "csv":
+        text = io.StringIO()
+        csv.writer(text, delimiter=";", lineterminator="\n").writerows(sheets[0])
+        data = text.getvalue().encode("utf-8")
+    else:
+        data = io.BytesIO()
+        with pd.ExcelWriter(data, engine="openpyxl") as writer:
+            for idx, grid in enumerate(sheets):
+                pd.DataFrame(grid).to_excel(writer, sheet_name=f"Sheet{idx + 1}", header=False, index=False)
+        data = data.getvalue()
+
+    return harness.MemoryFile(data, f"{name}.{fmt}")
+
+
+def read(file, layout, values=None):
+    """
+    Reads a file through the main reading method of the QupidReader that is used for a layout.
+    If the number of Ct `values` in the file is given, the assays must hold exactly as many replicates.
+    """
+    reader = qu.QupidReader()
+
+    if layout == "regular":
+        assays = [reader.SingleReader_read_regular(file, id_label=id_col, ct_label=ct_col)]
+    else:
+        if layout == "multi_assay":
+            assays, normalisers = reader.MultiReader_read(file, col=0)
+        elif layout == "multi_sheet":
+            assays, normalisers = reader.MultiSheetReader_read(file, col=0)
+        else:
+            assays, normalisers = reader.BigTableReader_read(file)
+        assays = assays + normalisers
+
+    # a read that produces no (or only empty) assays has failed
+    if len(assays) == 0 or any(len(i.get()) == 0 for i in assays):
+        raise ValueError(f"Reading the {layout} file produced no assays or empty assays.")
+
+    # and so has a read that misses (or adds) any replicates
+    found = sum(len(i.get()) for i in assays)
+    if values is not None and found != values:
+        raise ValueError(f"Reading the {layout} file produced {found} instead of {values} replicates.")
+    return assays
+
+
+def cases(sizes, layouts, formats):
+    """
+    Generates the benchmark cases.
+
+    Yields
+    -------
+    case : dict
+        The layout, format, size and transposition of a case.
+    """
+    for layout in layouts:
+        for fmt in formats:
+            if layout == "multi_sheet" and fmt != "xlsx":
+                continue
+            for transpose in ((False, True) if layout in ("multi_assay", "multi_sheet") else (False,)):
+                for size in sizes:
+                    yield dict(layout=layout, format=fmt, size=size, transpose=transpose)
+
+
+def run(sizes, layouts=layouts, formats=formats, repeat=3, seed=0):
+    """
+    Runs the reader benchmarks.
+
+    Returns
+    -------
+    results : list
+        The results of each case (see `harness.run_case`).
+    """
+    rng = np.random.default_rng(seed)
+    results = []
+
+    for case in cases(sizes, layouts, formats):
+        sheets, settings, values = generators[case["layout"]](case["size"], rng, transpose=case["transpose"])
+        file = to_file(sheets, case["format"], case["layout"])
+
+        # the generator's settings take precedence over the defaults
+        default_settings = dict(
+            delimiter=";",
+            transpose=False,
+            multi_sheet=False,
+            sheet_name=None,
+            names=None,
+            assay_pattern="all",
+            id_col=id_col,
+            ct_col=ct_col,
+            assay_col=assay_col,
+            workers=None,
+        )
+        settings = {**default_settings, **settings}
+
+        with harness.headless_session(settings):
+            result = harness.run_case(
+                "read",
+                partial(read, file, case["layout"], values),
+                setup=qu.read_cache.clear,
+                repeat=repeat,
+                items=values,
+                nbytes=file.size,
+                values=values,
+                **case,
+            )
+        results.append(result)
+
+    return results
+
+
+def main(argv=None):
+    parser = harness.argument_parser("Benchmark the reading of (synthetic) datafiles through the QupidReader.")
+    parser.add_argument("-n", "--sizes", type=int, nargs="+", default=[10 ** i for i in range(0, 7, 2)], help="The (approximate) numbers of Ct values per file (default is 1 100 10000 1000000).")
+    parser.add_argument("-l", "--layouts", nargs="+", choices=layouts, default=list(layouts), help="The file layouts to benchmark (default is all).")
+    parser.add_argument("-f", "--formats", nargs="+", choices=formats, default=list(formats), help="The file formats to benchmark (default is all).")
+    parser.add_argument("--seed", type=int, default=0, help="The seed for the random Ct values.")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, layouts=args.layouts, formats=args.formats, repeat=args.repeat, seed=args.seed)
+    failed = harness.report("readers", results, output=args.output, compare=args.compare)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
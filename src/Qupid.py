@@ -33,30 +33,119 @@ import qpcr
 import qpcr._auxiliary as aux
 from qpcr.Readers import * 
 from qpcr.Parsers import ArrayParser
+import cache
+import parallel
+import snapshot
 
-from io import StringIO, BytesIO
+from io import BytesIO
+import io
 import pandas as pd 
-from copy import deepcopy
-import re
+import numpy as np
+from functools import wraps, partial
+from xml.etree import ElementTree
+import zipfile
+import os
 
 
 
+# the backend of the session. By default this is the streamlit session_state,
+# but any dict can be used instead (see `use_session_state`), e.g. to run Qupid without streamlit
+_session_backend = None
+
+def session_state():
+    """
+    Returns the current session backend (by default the st.session_state).
+    """
+    if _session_backend is None:
+        return st.session_state
+    return _session_backend
+
+def is_headless():
+    """
+    Checks if a plain session backend is used instead of the st.session_state 
+    (i.e. if Qupid is run outside of a streamlit script run).
+    """
+    return _session_backend is not None
+
+def use_session_state(backend):
+    """
+    Sets a new session backend. 
+
+    Parameters
+    ----------
+    backend : dict
+        Any dictionary to use instead of the st.session_state. 
+        If None, the st.session_state is used again.
+    """
+    global _session_backend
+    _session_backend = backend
+
 # we also define session here, as we would 
 # otherwise have a circular import with controls
 def session(key, value = None, reset = False):
     """
     Adds a variable to the st.session state or gets it
     """
+    state = session_state()
     if value is not None :
-        st.session_state[key] = value
-    elif key in st.session_state     and value is None and not reset: 
-        return st.session_state[key]
-    elif key in st.session_state     and reset:
-        st.session_state[key] = None
-    elif key not in st.session_state:
+        state[key] = value
+    elif key in state     and value is None and not reset: 
+        return state[key]
+    elif key in state     and reset:
+        state[key] = None
+    elif key not in state:
         return None
 
 
+# the session settings that affect how the main reading methods
+# interpret a file (these become part of the cache keys of their results)
+read_settings = (
+                    "delimiter", "transpose", "multi_sheet", "sheet_name", 
+                    "replicates", "names", "assay_pattern", 
+                    "id_col", "ct_col", "assay_col", "kind",
+                )
+
+# regular vertical big table csv files above this size (in MB) are streamed
+# chunk-wise (of stream_chunksize rows) rather than read as a whole.
+stream_threshold = int( os.environ.get("QUPID_STREAM_MB", 32) ) * 1024 ** 2
+stream_chunksize = 100000
+
+# the cache for read data and assays that is shared by all QupidReaders.
+# The memory budget (in MB) can be set through the QUPID_READ_CACHE_MB variable.
+read_cache = cache.LRUCache( budget = int( os.environ.get("QUPID_READ_CACHE_MB", 256) ) * 1024 ** 2 )
+
+
+def cached_read(method):
+    """
+    Decorates a main reading method of the QupidReader so that its returned
+    assays are stored in the read_cache. The cache key is made from the file's contents,
+    the keyword arguments and all read_settings from the session.
+
+    Note
+    ----
+    The cache is shared by all sessions, so the cached qpcr.Assay objects are never handed out
+    themselves. Each call returns new copy-on-write views of them (see `snapshot.view`) instead.
+    """
+    @wraps(method)
+    def wrapper(self, file, **kwargs):
+
+        self.link(file)
+        settings = { key : session(key) for key in read_settings }
+        key = self._cache_key( method.__name__, kwargs, settings )
+
+        data = read_cache.get( key )
+        if data is None:
+            data = method(self, file, **kwargs)
+            read_cache.put( key, data )
+
+        # hand out views so the cached assays cannot be altered (by any session)
+        if isinstance(data, tuple):
+            return tuple( snapshot.views(i) for i in data )
+        return snapshot.view( data )
+
+    return wrapper
+
+
 class QupidReader:
     """
     Handles the Inferface between the streamlit app environment and the qpcr.Readers and qpcr.Parsers.
@@ -70,10 +159,15 @@ class QupidReader:
     But they vary in their required inputs, naturally. 
     
     The QupidReader stores the actual raw data of a read file in a _data attribute, but non of the actual Assays!
+    Both the preliminarily read data and the Assays returned by the main reading methods are stored
+    in the shared read_cache, so re-reading the same file with the same settings is (almost) free.
 
     """
     def __init__(self):
         self._src = None
+        self._file = None
+        self._buffer = None
+        self._digest = None
         self._filename = None
         self._data = None
         
@@ -124,8 +218,19 @@ class QupidReader:
         # get the filename
         self._name = UploadedFile.name
 
-        # store the object (deepcopy to be save...)
-        self._src = deepcopy(  UploadedFile  )
+        # the content buffer and digest are only set up anew for a new file
+        if UploadedFile is not self._file:
+            self._file = UploadedFile
+            self._digest = None
+
+            # getvalue() shares the uploaded buffer rather than copying it,
+            # and so does a BytesIO that is only ever read from. This gives us
+            # our own read cursor without touching the UploadedFile's position.
+            self._buffer = UploadedFile.getvalue()
+            self._src = BytesIO( self._buffer )
+
+        # rewind our cursor
+        self._src.seek(0)
 
         # and reset the data
         self._data = None
@@ -137,6 +242,17 @@ class QupidReader:
         """
         self.__init__()
 
+    def digest(self):
+        """
+        Returns 
+        -------
+        digest : str
+            The hash digest of the linked file's contents.
+        """
+        if self._digest is None:
+            self._digest = cache.fingerprint(  memoryview( self._buffer )  )
+        return self._digest
+
     def filesuffix(self):
         """
         Returns
@@ -212,33 +328,60 @@ class QupidReader:
         drop_nan : bool
             Will remove any all-nan lines from the data if True.
         """
-        data = pd.read_excel(self._src, header = header, sheet_name = None)
-
-        self._sheetnames = list(  data.keys()  )
+        # check if we have read the file like this before
+        key = self._cache_key( 
+                                "read_excel", header = header, to_numpy = to_numpy, drop_nan = drop_nan, 
+                                multi_sheet = session("multi_sheet"), sheet_name = session("sheet_name") 
+                            )
+        cached = read_cache.get( key )
+        if cached is not None:
+            self._data, self._sheetnames = cached
+            return
+
+        # get the sheet names from the workbook manifest and 
+        # only load the sheets that are actually going to be used
+        self.read_sheetnames()
+        sheets = self._sheets_to_read()
+        grids = self._read_grids( sheets )
+
+        # derive the requested view from the raw header-less grids
+        data = { sheet : header_view( grids[ sheet ], header ) for sheet in sheets }
 
         if drop_nan:
         # drop all-nan lines
-            for sheet in self._sheetnames:
+            for sheet in sheets:
                 data[ sheet ] = data[ sheet ].dropna(axis = 0, how = "all").reset_index(drop=True)
 
-        # # and store data
-        # self._data = data
-
-        # check if we got only a single sheet anyway
-        if len(self._sheetnames) == 1:
+        # check if we got only a single sheet to read anyway
+        # (either because there is only one or because a specific one was selected)
+        if len( sheets ) == 1 and not ( self.is_multisheet() and session("multi_sheet") ):
             # get the data from that only sheet
-            data = data[ self.sheets()[0] ]
-            if to_numpy:
-                data = data.to_numpy()
-
-        # or check if we are supposed to look only for a specific sheet
-        elif self.is_multisheet() and not session("multi_sheet") and session( "sheet_name" ) is not None:
-            data = data[  session( "sheet_name" )  ]
+            data = data[ sheets[0] ]
             if to_numpy:
                 data = data.to_numpy()
 
         # and store new data
         self._data = data
+        read_cache.put( key, (self._data, self._sheetnames) )
+
+    def read_sheetnames(self):
+        """
+        Reads only the sheet names of an excel file (from the workbook manifest)
+        without loading any of the actual cells.
+
+        Returns 
+        -------
+        sheets : list
+            A list of sheet names of the excel file.
+        """
+        key = self._cache_key( "read_sheetnames" )
+        sheets = read_cache.get( key )
+        if sheets is None:
+            sheets = WorkbookReader( self._src ).sheetnames()
+            read_cache.put( key, sheets )
+
+        self._sheetnames = sheets
+        return sheets
         
     
     def read_csv(self, header = 0, to_numpy = False, drop_nan = True, **kwargs):
@@ -255,16 +398,26 @@ class QupidReader:
         drop_nan : bool
             Will remove any all-nan lines from the data if True.
         """
-        # prep file and adjust commas
-        self._prep_csv(prepare_commas = True)
-        
         # get the appropriate delimiter from the session
         delimiter = session("delimiter")
 
+        # check if we have read the file like this before
+        key = self._cache_key( 
+                                "read_csv", header = header, to_numpy = to_numpy, 
+                                drop_nan = drop_nan, delimiter = delimiter 
+                            )
+        cached = read_cache.get( key )
+        if cached is not None:
+            self._data = cached
+            return
+
+        # prep file and adjust commas
+        self._prep_csv(prepare_commas = True)
+
         contents = self.get()
 
         # now read the data and drop all-nan lines
-        df = pd.read_csv(contents, header = header, sep = delimiter)
+        df = pd.read_csv(contents, header = header, sep = delimiter, encoding = "utf-8")
         if drop_nan: 
             df = df.dropna(axis = 0, how = "all").reset_index(drop=True)
     
@@ -273,6 +426,7 @@ class QupidReader:
         
         # and store data
         self._data = df
+        read_cache.put( key, self._data )
 
 
 
@@ -282,6 +436,7 @@ class QupidReader:
 
     # The nomenclature is always {CoreReader}_read[_{filetype}]
 
+    @cached_read
     def SingleReader_read_regular(self, file, **kwargs):
         """
         Reads a regular datafile in either excel or csv format.
@@ -321,6 +476,7 @@ class QupidReader:
 
         return assay
 
+    @cached_read
     def MultiReader_read(self, file, **kwargs):
         """
         Reads an irregular decorated multi-assay datafile 
@@ -388,6 +544,7 @@ class QupidReader:
 
         return assays, normalisers
 
+    @cached_read
     def MultiSheetReader_read(self, file, **kwargs):
         """
         Reads an irregular decorated multi-assay and multi-sheet excel file.
@@ -411,56 +568,27 @@ class QupidReader:
         else:
             self.read_excel(**kwargs)
 
-        # setup MultiReader (we manually iterate over the sheets)
-        reader = MultiReader()
-
-        # link setup data from session
-        replicates_from_session(reader)
+        # get the settings for the sheets' readers and parsers 
+        # from the session, since the workers cannot access it
+        settings = parser_settings_from_session()
 
-        # setup an ArrayParser
-        reader._Parser = ArrayParser()
-        setup_parser_from_session(reader)
+        # get the data sheets as numpy arrays
+        sheets = [ self._data[ sheet ].to_numpy() for sheet in self.sheets() ]
 
+        # parse the sheets concurrently, the results come back in sheet order
+        parse = partial( parse_sheet, settings = settings, **kwargs )
+        results = parallel.pmap( parse, sheets, workers = session("workers") )
 
         # setup assays and normalsiers lists
         assays = []
         normalisers = []
-
-        # iterate over all sheets
-        for sheet in self.sheets():
-            
-            # get data sheet and 
-            # convert to numpy array
-            data = self._data[ sheet ]
-            data = data.to_numpy()
-
-            # feed data to Parser and parse for assays
-            # since we now have multiple sheets, it's okey not to find
-            # any assays or normalisers on a given sheet
-            reader._Parser.read( data )
-            id_label, ct_label = session("id_col"), session("ct_col")
-            reader.parse( 
-                            decorator = True, 
-                            ignore_empty = True, 
-                            id_label = id_label, 
-                            ct_label = ct_label,
-                            **kwargs 
-                    )
-            reader.make_Assays()
-
-            # get assays and normalisers
-            a, _ = reader.assays()
-            n, _ = reader.normalisers()
-
+        for a, n in results:
             assays.extend( a )
             normalisers.extend ( n )
 
-            # clear memory after each sheet
-            reader.clear()
-            reader._Parser.clear()
-
         return assays, normalisers
 
+    @cached_read
     def BigTableReader_read(self, file, **kwargs):
         """
         Reads a decorated big table file in excel or csv format.
@@ -478,6 +606,18 @@ class QupidReader:
         """
 
         self.link( file )
+
+        # large regular vertical big tables are streamed chunk-wise 
+        # instead of being read into one big DataFrame first
+        if self._is_streamable():
+            assays, normalisers = [], []
+            for decorator, assay in self.BigTableReader_stream( file ):
+                if decorator == "normaliser":
+                    normalisers.append( assay )
+                else:
+                    assays.append( assay )
+            return assays, normalisers
+
         if self.is_csv():
             self.read_csv()
         else:
@@ -595,14 +735,185 @@ class QupidReader:
     #   Auxiliary methods
     # ---------------------------------------------------------------
 
+    def BigTableReader_stream(self, file, chunksize = None):
+        """
+        Reads a regular vertical big table csv file chunk-wise. 
+
+        Rows are grouped by their assay (and decorator) as they come in, and 
+        each assay is converted to a qpcr.Assay as soon as all of its rows have been read.
+        The assays are yielded in the same order as the qpcr.BigTableReader extracts them 
+        (assays that are complete before their turn are held back until then).
+
+        Note
+        ----
+        Only the parsing is memory-bound (by the largest assay rather than the whole table). 
+        The returned assays still hold all the data (and `BigTableReader_read` collects all of them).
+
+        Parameters
+        ----------
+        file : st.UploadedFile
+            An UploadedFile object to read.
+        chunksize : int
+            The number of rows to read at a time. 
+            By default the `stream_chunksize` is used.
+
+        Yields
+        -------
+        decorator : str
+            Either `"assay"` or `"normaliser"`. For undecorated tables all assays are `"assay"`.
+        assay : qpcr.Assay
+            A qpcr.Assay of the file's assay data.
+        """
+        self.link( file )
+        chunksize = stream_chunksize if chunksize is None else chunksize
+
+        id_col, ct_col, assay_col = session("id_col"), session("ct_col"), session("assay_col")
+        decorated = "@qpcr" in self._csv_header()
+        key_cols = [ "@qpcr", assay_col ] if decorated else assay_col
+        columns = [ id_col, ct_col, "@qpcr", assay_col ] if decorated else [ id_col, ct_col, assay_col ]
+
+        # first count the rows of each assay so we know when one is complete
+        # (only the assay and decorator columns are read for this)
+        totals = {}
+        for chunk in self._csv_chunks( columns[2:], chunksize ):
+            counts = chunk.groupby( key_cols, sort = False ).size()
+            for key, count in counts.items():
+                totals[ key ] = totals.get( key, 0 ) + count
+
+        # the qpcr.BigTableReader extracts the assays (and then the normalisers)
+        # in the order of the set of their names, so we do the same here
+        # (the set is built in the order of appearance, just like from the table itself)
+        keys = { ( key if decorated else ( "assay", key ) ) : key for key in totals }
+        order = []
+        for decorator in ( "assay", "normaliser" ):
+            names = set( name for _decorator, name in keys if _decorator == decorator )
+            order.extend( keys[ ( decorator, name ) ] for name in names )
+        order.reverse()
+
+        # now collect the rows of each assay and yield 
+        # the complete assays as we go along
+        to_defaults = dict( zip( [ id_col, ct_col ], qpcr.defaults.raw_col_names ) )
+        pending, complete = {}, {}
+        for chunk in self._csv_chunks( columns, chunksize ):
+            for key, subset in chunk.groupby( key_cols, sort = False ):
+
+                # rows that are decorated as neither assay nor normaliser are ignored
+                decorator, name = key if decorated else ( "assay", key )
+                if decorator not in ( "assay", "normaliser" ):
+                    continue
+
+                pending.setdefault( key, [] ).append( subset[ [id_col, ct_col] ] )
+                totals[ key ] -= len( subset )
+                if totals[ key ] > 0:
+                    continue
+
+                # assemble the assay's data just like the qpcr.BigTableReader does
+                subset = pd.concat( pending.pop( key ), ignore_index = True )
+                cts = np.genfromtxt( np.array( subset[ ct_col ].to_numpy(), dtype = str ) )
+                subset[ ct_col ] = np.atleast_1d( cts )
+                subset = subset.rename( columns = to_defaults )
+
+                complete[ key ] = decorator, qpcr.Assay( 
+                                                        df = subset, id = name, 
+                                                        replicates = session("replicates"), 
+                                                        group_names = session("names") 
+                                                    )
+                
+                # yield all complete assays whose turn has come
+                while order and order[-1] in complete:
+                    yield complete.pop( order.pop() )
+
+    def _is_streamable(self):
+        """
+        Checks if the linked file is a csv file of a regular vertical big table 
+        that is large enough to be worth streaming (see `stream_threshold`).
+        """
+        if not self.is_csv() or session("kind") != "vertical":
+            return False
+        if len( self._buffer ) < stream_threshold:
+            return False
+        header = self._csv_header()
+        cols = [ session("id_col"), session("ct_col"), session("assay_col") ]
+        return all( col in header for col in cols )
+
+    def _csv_header(self):
+        """
+        Reads only the header of a csv file.
+        """
+        header = pd.read_csv( 
+                                BytesIO( self._buffer ), sep = session("delimiter"), 
+                                nrows = 0, encoding = "utf-8" 
+                            )
+        return list( header.columns )
+
+    def _csv_chunks(self, columns, chunksize):
+        """
+        Reads selected columns of a csv file in chunks.
+        Rows without an assay (or decorator) are dropped, as these cannot belong to any assay.
+        """
+        key_cols = [ col for col in columns if col in ( "@qpcr", session("assay_col") ) ]
+        data = io.BufferedReader( PaddedCsv( self._buffer, session("delimiter") ) )
+        chunks = pd.read_csv( 
+                                data, sep = session("delimiter"), encoding = "utf-8",
+                                usecols = columns, dtype = { col : str for col in key_cols }, 
+                                chunksize = chunksize,
+                            )
+        for chunk in chunks:
+            yield chunk.dropna( subset = key_cols )
+
+    def _sheets_to_read(self):
+        """
+        Gets the sheets of an excel file that have to be read given the current session settings.
+        These are either the only sheet, the selected sheet, or all sheets of a multi-sheet file.
+        """
+        sheets = self.sheets()
+        if len( sheets ) == 1:
+            return sheets
+
+        sheet_name = session("sheet_name")
+        if not session("multi_sheet") and sheet_name is not None:
+            return [ sheet_name ]
+
+        return sheets
+
+    def _read_grids(self, sheets):
+        """
+        Gets the raw header-less grids of the given sheets of an excel file. 
+        Grids that were not read before are loaded together in one go.
+        
+        Returns
+        -------
+        grids : dict
+            A dictionary of sheet names (keys) and raw grids as pandas DataFrames (values).
+        """
+        keys = { sheet : self._cache_key( "grid", sheet ) for sheet in sheets }
+        grids = { sheet : read_cache.get( key ) for sheet, key in keys.items() }
+
+        missing = [ sheet for sheet, grid in grids.items() if grid is None ]
+        if len( missing ) > 0:
+            loaded = WorkbookReader( self._src ).grids( missing )
+            for sheet in missing:
+                grids[ sheet ] = loaded[ sheet ]
+                read_cache.put( keys[ sheet ], loaded[ sheet ] )
+
+        return grids
+
+    def _cache_key(self, *parts, **params):
+        """
+        Generates a read_cache key for the linked file and the given reading parameters.
+        """
+        return cache.fingerprint( self.digest(), *parts, **params )
+
     def _prep_csv(self, prepare_commas = False):
         """
-        Prepares a csv file to be read by a Reader
+        Prepares a csv file to be read by a Reader.
+        The (binary) file-like object is stored in the _data attribute
+        and must be read using `utf-8` encoding.
         """
-        data = self._src.read().decode('utf-8')
         if prepare_commas:
-            data = self._prepare_commas(data)
-        data = StringIO(data)
+            data = io.BufferedReader( PaddedCsv( self._buffer, session("delimiter") ) )
+        else:
+            data = BytesIO( self._buffer )
         self._data = data
 
 
@@ -611,26 +922,228 @@ class QupidReader:
         Performs the `qpcr.Parsers.CsvParser._prepare_commas()` method to 
         make the commas equal within the entire csv file. We need this because
         otherwise pandas would read nonsense and the numpy array would also be crap.
+
+        Note
+        ----
+        This works on an already decoded string. Files are better read 
+        streaming through a `PaddedCsv` directly (as `_prep_csv` does).
         """
-        
-        content = data
-        delimiter = session("delimiter")
+        padded = PaddedCsv( data.encode("utf-8"), session("delimiter") )
+        new_content = padded.readall().decode("utf-8")
+        return new_content
+
 
-        has_quotes = f'"{delimiter}"' in content
+class PaddedCsv(io.RawIOBase):
+    """
+    A read-only binary stream over the contents of a csv file that pads every line 
+    with empty entries so that all lines have the same number of delimiters 
+    (like `qpcr.Parsers.CsvParser._prepare_commas()` does). 
+
+    The contents are never decoded or split as a whole. Delimiters are counted line by line 
+    directly on the raw bytes (without copying them), and the padded lines are only 
+    assembled chunk-wise as the stream is read (e.g. by `pd.read_csv`).
+
+    Parameters
+    ----------
+    buffer : bytes
+        The raw contents of the csv file.
+    delimiter : str
+        The delimiter used in the file.
+    chunksize : int
+        The approximate number of bytes to assemble at a time.
+    """
+    def __init__(self, buffer, delimiter, chunksize = 2 ** 20):
+        super().__init__()
+        self._buffer = buffer
+        self._chunksize = chunksize
 
         # check if quotes are in datafile and adjust comma-patterns to use
-        empty_comma_filler = f'{delimiter}""' if has_quotes else f"{delimiter}"
-        comma_sep = f'"{delimiter}"' if has_quotes else f"{delimiter}"
-        comma_sep = re.compile(comma_sep)
-
-        # update commas to make equal...
-        lines = content.split("\n")
-        comma_counts = [len(comma_sep.findall(i)) for i in lines]
-        max_commas = max(comma_counts)
-        lines = [i + (max_commas - j) * empty_comma_filler for i, j in zip(lines, comma_counts)]
+        delimiter = delimiter.encode("utf-8")
+        has_quotes = b'"' + delimiter + b'"' in buffer
+        self._filler = delimiter + b'""' if has_quotes else delimiter
+        self._sep = b'"' + delimiter + b'"' if has_quotes else delimiter
+
+        # count the delimiters of each line 
+        # to know how much padding each line needs
+        self._counts = [ buffer.count( self._sep, start, end ) for start, end in self._lines() ]
+        self._max = max( self._counts )
+
+        self._chunks = self._padded_chunks()
+        self._pending = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        """
+        Fills a pre-allocated buffer with the next padded bytes.
+        """
+        while not self._pending:
+            self._pending = next( self._chunks, None )
+            if self._pending is None:
+                self._pending = b""
+                return 0
         
-        new_content = "\n".join(lines)
-        return new_content
+        size = min( len(b), len(self._pending) )
+        b[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def _lines(self):
+        """
+        Generates the (start, end) positions of all lines in the buffer 
+        (split at newlines just like `str.split("\n")` would).
+        """
+        start = 0
+        end = self._buffer.find( b"\n" )
+        while end != -1:
+            yield start, end
+            start = end + 1
+            end = self._buffer.find( b"\n", start )
+        yield start, len( self._buffer )
+
+    def _padded_chunks(self):
+        """
+        Generates chunks of padded lines of approximately the set chunksize.
+        """
+        chunk = []
+        size = 0
+        buffer = memoryview( self._buffer )
+        for ( start, end ), count in zip( self._lines(), self._counts ):
+            
+            # pad the line and re-add the newline 
+            # (except for the very last line)
+            line = bytes( buffer[ start : end ] ) + ( self._max - count ) * self._filler
+            if end < len( self._buffer ):
+                line += b"\n"
+
+            chunk.append( line )
+            size += len( line )
+            if size >= self._chunksize:
+                yield b"".join( chunk )
+                chunk = []
+                size = 0
+
+        yield b"".join( chunk )
+
+
+class LocalFile(BytesIO):
+    """
+    An in-memory file that stands in for a streamlit `UploadedFile` 
+    (e.g. to read files from disk without streamlit).
+
+    Parameters
+    ----------
+    path : str
+        The path to the file.
+    """
+    def __init__(self, path):
+        with open( path, "rb" ) as f:
+            super().__init__( f.read() )
+        self.name = os.path.basename( path )
+        self.size = len( self.getbuffer() )
+
+    def __repr__(self):
+        return f"LocalFile(name='{self.name}', size={self.size})"
+
+
+class WorkbookReader:
+    """
+    Reads the sheets of an excel workbook from a file-like object.
+
+    The sheet names are read directly from the workbook manifest (`xl/workbook.xml`) 
+    so no cells have to be loaded just to learn which sheets a file has. Sheets are only 
+    loaded on request, and each only once as a raw header-less grid. Views that use one 
+    of the rows as header can then be derived from the grid using `header_view`.
+
+    Parameters
+    ----------
+    src : file-like
+        A file-like object of an `xlsx` file.
+    """
+    __manifest__ = "xl/workbook.xml"
+    __namespace__ = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+
+    def __init__(self, src):
+        self._src = src
+
+    def sheetnames(self):
+        """
+        Returns 
+        -------
+        sheets : list
+            A list of all sheet names in the order they appear in the workbook.
+        """
+        self._src.seek(0)
+        with zipfile.ZipFile( self._src ) as archive:
+            manifest = ElementTree.fromstring( archive.read( self.__manifest__ ) )
+
+        sheets = manifest.iter( f"{self.__namespace__}sheet" )
+        sheets = [ sheet.get("name") for sheet in sheets ]
+        return sheets
+
+    def grids(self, sheets):
+        """
+        Loads the given sheets as raw header-less grids.
+
+        Parameters
+        ----------
+        sheets : list
+            A list of sheet names to load.
+
+        Returns
+        -------
+        grids : dict
+            A dictionary of sheet names (keys) and raw grids as pandas DataFrames (values).
+        """
+        self._src.seek(0)
+        grids = pd.read_excel( self._src, header = None, sheet_name = list( sheets ) )
+        return grids
+
+
+def header_view(grid, header = 0):
+    """
+    Derives the DataFrame pandas would read with a given header row from a raw header-less grid.
+    Column names are made the same way pandas does (`Unnamed: i` for blank and `name.1` for 
+    duplicate headers) and the column dtypes are inferred again for the rows below the header.
+
+    Parameters
+    ----------
+    grid : pd.DataFrame
+        A raw grid read with `header = None`.
+    header : int or None
+        The row to use as header. If None, the grid is returned as is.
+
+    Returns
+    -------
+    df : pd.DataFrame
+        The DataFrame with the header row as column names.
+    """
+    if header is None:
+        return grid
+
+    names = []
+    for idx, name in enumerate( grid.iloc[ header ] if len( grid ) > header else [] ):
+        if name != name:
+            name = f"Unnamed: {idx}"
+        # mangle duplicate names like pandas does
+        new_name, count = name, 0
+        while new_name in names:
+            count += 1
+            new_name = f"{name}.{count}"
+        names.append( new_name )
+
+    df = grid.iloc[ header + 1 : ].reset_index( drop = True )
+    df.columns = names if len( names ) > 0 else df.columns
+    
+    # re-infer the columns dtypes now that the header row is gone
+    for col in df.columns[ df.dtypes == object ]:
+        try:
+            df[ col ] = pd.to_numeric( df[ col ] )
+        except ( ValueError, TypeError ):
+            df[ col ] = df[ col ].infer_objects()
+
+    return df
 
 
 def replicates_from_session(reader):
@@ -666,6 +1179,19 @@ def sheet_name_from_session(Qreader):
     sheet_name = Qreader.sheets()[0] if sheet_name is None else sheet_name
     return sheet_name
 
+def parser_settings_from_session():
+    """
+    Gets the settings required to set up a Reader and its Parser from the session.
+
+    Returns
+    -------
+    settings : dict
+        A dictionary of the replicates, names, assay_pattern, transpose, id_col, and ct_col settings.
+    """
+    keys = ( "replicates", "names", "assay_pattern", "transpose", "id_col", "ct_col" )
+    settings = { key : session(key) for key in keys }
+    return settings
+
 def setup_parser_from_session(reader):
     """
     Sets up parameters of a Reader's Parser from session_state variables
@@ -675,15 +1201,75 @@ def setup_parser_from_session(reader):
     reader
         A qpcr.Readers object that has a ._Parser attribute.
     """
+    setup_parser( reader, parser_settings_from_session() )
+
+def setup_parser(reader, settings):
+    """
+    Sets up parameters of a Reader's Parser from a settings dictionary
+    
+    Parameters
+    --------
+    reader
+        A qpcr.Readers object that has a ._Parser attribute.
+    settings : dict
+        The settings as returned by `parser_settings_from_session`.
+    """
     # setup assay_pattern
-    reader._Parser.assay_pattern(  session("assay_pattern")  )
+    reader._Parser.assay_pattern(  settings["assay_pattern"]  )
             
     # set transposed
-    if session("transpose"): 
+    if settings["transpose"]: 
         reader._Parser.transpose()
 
     # add the data column labels
     reader._Parser.labels(
-                            id_label = session("id_col"), 
-                            ct_label = session("ct_col")
+                            id_label = settings["id_col"], 
+                            ct_label = settings["ct_col"]
                         )
+
+def parse_sheet(data, settings, **kwargs):
+    """
+    Parses the assays and normalisers from a single sheet of a multi-sheet file.
+    This is used by the workers of `QupidReader.MultiSheetReader_read`.
+
+    Parameters
+    ----------
+    data : np.ndarray
+        The sheet's data.
+    settings : dict
+        The settings as returned by `parser_settings_from_session`.
+    **kwargs
+        Any additional keyword arguments for `MultiReader.parse`.
+
+    Returns
+    -------
+    assays : list
+        A list of qpcr.Assay object of the sheet's assay data.
+    normalisers : list
+        A list of qpcr.Assay object of the sheet's normaliser-assay data.
+    """
+    # setup MultiReader and its Parser
+    reader = MultiReader()
+    reader._replicates = settings["replicates"]
+    reader._names = settings["names"]
+
+    reader._Parser = ArrayParser()
+    setup_parser( reader, settings )
+
+    # feed data to Parser and parse for assays
+    # since we now have multiple sheets, it's okey not to find
+    # any assays or normalisers on a given sheet
+    reader._Parser.read( data )
+    reader.parse( 
+                    decorator = True, 
+                    ignore_empty = True, 
+                    id_label = settings["id_col"], 
+                    ct_label = settings["ct_col"],
+                    **kwargs 
+            )
+    reader.make_Assays()
+
+    # get assays and normalisers
+    assays, _ = reader.assays()
+    normalisers, _ = reader.normalisers()
+    return assays, normalisers
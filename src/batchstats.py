@@ -0,0 +1,330 @@
+"""
+This module defines a batched engine for the statistical tests of Delta-Delta-Ct results.
+
+The tests of `qpcr.stats` loop over all assays (or groups) and compute one t-test (or ANOVA) at a time. Here, the
+summary statistics (count, mean and variance) of every group of every assay are computed at once, from which the
+t-statistics of all pairs of all assays (or the F-statistics of all assays) are computed as arrays. The p-values are
+then corrected for multiple testing (Benjamini-Hochberg) for all comparisons at once.
+
+The tests return the same `qpcr.stats` Comparison objects (in a ComparisonsCollection) as the tests of `qpcr.stats`,
+so their tables (`to_df`) have the same shape as before.
+
+Note
+----
+Just like `qpcr.stats`, the t-tests assume equal variances (Student's t-test) by default,
+Welch's t-test can be used by passing `equal_var=False`. Missing values (e.g. of filtered replicates)
+are omitted by both the t-tests and the ANOVA.
+"""
+
+import numpy as np
+import pandas as pd
+import qpcr.defaults as defaults
+import qpcr.stats.Comparisons as Comparisons
+from itertools import permutations
+from scipy import stats as scistats
+
+
+def summaries(df, outer, inner, columns):
+    """
+    Computes the count, mean, and variance of each group of replicates of each assay.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The results dataframe.
+    outer : str
+        The comparisons are performed separately for each `assay` or each group (any of the setup columns).
+    inner : str
+        The partners that are compared within each comparison (either `assay` or any of the setup columns).
+    columns : list
+        The data columns (assays) to use.
+
+    Returns
+    -------
+    outer_labels : list
+        The labels of the comparisons.
+    inner_labels : list
+        The labels of the compared partners.
+    n : np.ndarray
+        The number of (non-missing) values of each partner of each comparison (`outer x inner`).
+    mean : np.ndarray
+        The means (`outer x inner`).
+    var : np.ndarray
+        The (unbiased) variances (`outer x inner`).
+    """
+    group_col = outer if inner == defaults.dataset_header else inner
+    values = df.melt(id_vars=[group_col], value_vars=columns, var_name=defaults.dataset_header, value_name="value")
+
+    stats = values.groupby([outer, inner])["value"].agg(["count", "mean", "var"])
+
+    # the assays keep their order, the groups are sorted (just like in qpcr.stats)
+    order = lambda col: list(columns) if col == defaults.dataset_header else sorted(df[col].unique())
+    outer_labels, inner_labels = order(outer), order(inner)
+
+    index = pd.MultiIndex.from_product([outer_labels, inner_labels])
+    stats = stats.reindex(index)
+    shape = (len(outer_labels), len(inner_labels))
+
+    n = stats["count"].fillna(0).to_numpy().reshape(shape)
+    mean = stats["mean"].to_numpy(dtype=float).reshape(shape)
+    var = stats["var"].to_numpy(dtype=float).reshape(shape)
+    return outer_labels, inner_labels, n, mean, var
+
+
+def ttests(n_a, mean_a, var_a, n_b, mean_b, var_b, equal_var=True):
+    """
+    Computes two-sided independent t-tests from summary statistics (all arrays of the same shape).
+
+    Parameters
+    ----------
+    equal_var : bool
+        Assume equal variances (Student's t-test), otherwise Welch's t-test is performed.
+
+    Returns
+    -------
+    statistic : np.ndarray
+        The t-statistics.
+    pvalues : np.ndarray
+        The p-values.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if equal_var:
+            dof = n_a + n_b - 2
+            pooled = ((n_a - 1) * var_a + (n_b - 1) * var_b) / dof
+            se = np.sqrt(pooled * (1 / n_a + 1 / n_b))
+        else:
+            v_a, v_b = var_a / n_a, var_b / n_b
+            dof = (v_a + v_b) ** 2 / (v_a ** 2 / (n_a - 1) + v_b ** 2 / (n_b - 1))
+            se = np.sqrt(v_a + v_b)
+
+        statistic = (mean_a - mean_b) / se
+
+    # (at least two values per partner are required)
+    invalid = (n_a < 2) | (n_b < 2)
+    statistic = np.where(invalid, np.nan, statistic)
+    pvalues = 2 * scistats.t.sf(np.abs(statistic), np.where(invalid, 1, dof))
+    pvalues = np.where(np.isnan(statistic), np.nan, pvalues)
+    return statistic, pvalues
+
+
+def fdr_correction(pvalues):
+    """
+    Corrects p-values for multiple testing using the Benjamini-Hochberg procedure.
+    Each row is corrected separately, missing values are ignored.
+
+    Parameters
+    ----------
+    pvalues : np.ndarray
+        A 2D array of p-values (one row per set of comparisons).
+
+    Returns
+    -------
+    adjusted : np.ndarray
+        The adjusted p-values.
+    """
+    pvalues = np.atleast_2d(pvalues)
+    valid = np.isfinite(pvalues)
+    tests = valid.sum(axis=1, keepdims=True)
+
+    # sort each row (missing values last) and scale by the number of tests over the rank
+    order = np.argsort(np.where(valid, pvalues, np.inf), axis=1, kind="mergesort")
+    ranked = np.take_along_axis(pvalues, order, axis=1)
+    ranks = np.arange(1, pvalues.shape[1] + 1)
+    scaled = np.where(np.take_along_axis(valid, order, axis=1), ranked * tests / ranks, np.inf)
+
+    # the adjusted p-values must not decrease with the rank
+    scaled = np.minimum.accumulate(scaled[:, ::-1], axis=1)[:, ::-1]
+    scaled = np.minimum(scaled, 1)
+
+    adjusted = np.full(pvalues.shape, np.nan)
+    np.put_along_axis(adjusted, order, scaled, axis=1)
+    adjusted[~valid] = np.nan
+    return adjusted
+
+
+def pairwise_ttests(results, outer, inner, columns, pairs=None, equal_var=True):
+    """
+    Performs pairwise t-tests between the partners of each comparison.
+
+    Parameters
+    ----------
+    results : qpcr.Results
+        The results.
+    outer : str
+        The column that defines the separate comparisons.
+    inner : str
+        The column that defines the partners to compare.
+    columns : list
+        The data columns (assays) to use.
+    pairs : list
+        The pairs of partners to compare (tuples), or the partners to compare pairwise (a list of labels).
+        By default all pairs of partners are compared.
+    equal_var : bool
+        Assume equal variances (Student's t-test), otherwise Welch's t-test is performed.
+
+    Returns
+    -------
+    comparisons : qpcr.stats.Comparisons.ComparisonsCollection
+        A PairwiseComparison for each comparison.
+    """
+    outer_labels, inner_labels, n, mean, var = summaries(results.get(), outer, inner, columns)
+
+    # get the pairs to compare and the labels of interest
+    if pairs is None:
+        pairs = list(permutations(inner_labels, r=2))
+        subset = [inner_labels, inner_labels]
+    elif isinstance(pairs[0], (list, tuple)):
+        subset = [[i[0] for i in pairs], [i[1] for i in pairs]]
+    else:
+        subset = [list(pairs), list(pairs)]
+        pairs = list(permutations(pairs, r=2))
+
+    # each pair is only tested once (in the order it was first listed)
+    position = {label: idx for idx, label in enumerate(inner_labels)}
+    tested, seen = [], set()
+    for a, b in pairs:
+        if (a, b) not in seen and (b, a) not in seen:
+            tested.append((a, b))
+            seen.add((a, b))
+    idx_a = np.array([position[a] for a, _ in tested], dtype=int)
+    idx_b = np.array([position[b] for _, b in tested], dtype=int)
+
+    # compute all t-tests of all comparisons at once
+    statistic, pvalues = ttests(n[:, idx_a], mean[:, idx_a], var[:, idx_a], n[:, idx_b], mean[:, idx_b], var[:, idx_b], equal_var=equal_var)
+    effect_size = np.abs(mean[:, idx_a] - mean[:, idx_b])
+    adjusted = fdr_correction(pvalues)
+
+    size = len(inner_labels)
+    collection = {}
+    for idx, name in enumerate(outer_labels):
+
+        # the results are arranged as qpcr.stats does (partner b in rows, partner a in columns)
+        arrays = []
+        for values in (pvalues, statistic, effect_size, adjusted):
+            grid = np.full((size, size), np.nan)
+            grid[idx_b, idx_a] = values[idx]
+            arrays.append(grid)
+        raw, tstats, effects, adj = arrays
+
+        comparison = Comparisons.PairwiseComparison(id=name, pvalues=raw, effect_size=effects, statistic=tstats, labels=inner_labels, subset=subset)
+
+        # the p-values are already adjusted (in place, since the comparison refers to the array)
+        comparison._pvalues[:] = adj
+        comparison._p_are_adjusted = True
+        collection[name] = comparison
+
+    collection = Comparisons.ComparisonsCollection(collection)
+    results.add_comparisons(collection)
+    return collection
+
+
+def anova(results, outer, inner, columns):
+    """
+    Performs one-way ANOVAs between the partners of each comparison.
+
+    Parameters
+    ----------
+    results : qpcr.Results
+        The results.
+    outer : str
+        The column that defines the separate comparisons.
+    inner : str
+        The column that defines the partners to compare.
+    columns : list
+        The data columns (assays) to use.
+
+    Returns
+    -------
+    comparisons : qpcr.stats.Comparisons.ComparisonsCollection
+        An AnovaComparison for each comparison.
+    """
+    outer_labels, _, n, mean, var = summaries(results.get(), outer, inner, columns)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        present = n > 0
+        k = present.sum(axis=1)
+        total = n.sum(axis=1)
+        grand_mean = np.nansum(n * mean, axis=1) / total
+
+        between = np.nansum(n * (mean - grand_mean[:, None]) ** 2, axis=1)
+        within = np.nansum(np.where(n > 1, (n - 1) * var, 0), axis=1)
+
+        dof_between, dof_within = k - 1, total - k
+        statistic = (between / dof_between) / (within / dof_within)
+
+    invalid = (dof_between < 1) | (dof_within < 1)
+    statistic = np.where(invalid, np.nan, statistic)
+    pvalues = scistats.f.sf(statistic, np.maximum(dof_between, 1), np.maximum(dof_within, 1))
+
+    collection = {name: Comparisons.AnovaComparison(id=name, pvalue=p, statistic=f) for name, p, f in zip(outer_labels, pvalues, statistic)}
+    return Comparisons.ComparisonsCollection(collection)
+
+
+def assaywise_ttests(results, groups=None, equal_var=True):
+    """
+    Performs pairwise t-tests comparing the groups within each assay (see `qpcr.stats.assaywise_ttests`).
+
+    Parameters
+    ----------
+    results : qpcr.Results
+        The results (the comparisons are added to it).
+    groups : list
+        The pairs of group names to compare (or the group names to compare pairwise).
+        By default all pairs of groups are compared.
+    equal_var : bool
+        Assume equal variances (Student's t-test), otherwise Welch's t-test is performed.
+
+    Returns
+    -------
+    comparisons : qpcr.stats.Comparisons.ComparisonsCollection
+        A PairwiseComparison for each assay.
+    """
+    # (all groups are paired in the order of their appearance, just like in qpcr.stats)
+    groups = results.names() if groups is None else groups
+    return pairwise_ttests(results, defaults.dataset_header, "group_name", results.data_cols, pairs=groups, equal_var=equal_var)
+
+
+def groupwise_ttests(results, columns=None, equal_var=True):
+    """
+    Performs pairwise t-tests comparing the assays within each group (see `qpcr.stats.groupwise_ttests`).
+
+    Parameters
+    ----------
+    results : qpcr.Results
+        The results (the comparisons are added to it).
+    columns : list
+        The pairs of assays to compare (or the assays to compare pairwise).
+        By default all pairs of assays are compared.
+    equal_var : bool
+        Assume equal variances (Student's t-test), otherwise Welch's t-test is performed.
+
+    Returns
+    -------
+    comparisons : qpcr.stats.Comparisons.ComparisonsCollection
+        A PairwiseComparison for each group.
+    """
+    return pairwise_ttests(results, "group_name", defaults.dataset_header, results.data_cols, pairs=columns, equal_var=equal_var)
+
+
+def assaywise_anova(results):
+    """
+    Performs a one-way ANOVA of the groups within each assay (see `qpcr.stats.assaywise_anova`).
+
+    Returns
+    -------
+    comparisons : qpcr.stats.Comparisons.ComparisonsCollection
+        An AnovaComparison for each assay.
+    """
+    return anova(results, defaults.dataset_header, "group", results.data_cols)
+
+
+def groupwise_anova(results):
+    """
+    Performs a one-way ANOVA of the assays within each group (see `qpcr.stats.groupwise_anova`).
+
+    Returns
+    -------
+    comparisons : qpcr.stats.Comparisons.ComparisonsCollection
+        An AnovaComparison for each group.
+    """
+    return anova(results, "group", defaults.dataset_header, results.data_cols)
@@ -0,0 +1,217 @@
+"""
+This module defines the caches that Qupid uses to avoid repeating expensive work
+across the many reruns of the streamlit app.
+
+At its core it defines the LRUCache, a thread-safe least-recently-used store for
+arbitrary objects. Entries are evicted as soon as either a maximum number of entries
+or a memory budget (in bytes) is exceeded. The memory footprint of each entry is
+estimated using `sizeof` which knows about pandas DataFrames, numpy arrays and
+qpcr.Assay objects (as well as lists and dicts thereof).
+
+Keys for any uploaded data are best generated using `fingerprint`, which hashes the
+raw bytes of a file together with any parameters that were used to read it.
+"""
+
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def fingerprint(*parts, **params):
+    """
+    Generates a hash digest from any number of data parts and parameters.
+
+    Parameters
+    ----------
+    *parts
+        Raw data (`bytes` or `memoryview`) are hashed directly,
+        any other objects are hashed through their `repr`.
+    **params
+        Any additional (named) parameters. These are sorted by name
+        so their order does not affect the digest.
+
+    Returns
+    -------
+    digest : str
+        The hexadecimal digest.
+    """
+    digest = hashlib.sha1()
+    for part in parts:
+        if not isinstance(part, (bytes, bytearray, memoryview)):
+            part = repr(part).encode()
+        digest.update(part)
+    for key in sorted(params):
+        digest.update(f"{key}={params[key]!r};".encode())
+    return digest.hexdigest()
+
+
+def sizeof(obj):
+    """
+    Estimates the memory footprint of an object in bytes.
+
+    Parameters
+    ----------
+    obj
+        Any object. pandas and numpy objects, as well as qpcr.Assays,
+        and lists, tuples, or dicts thereof are estimated recursively.
+
+    Returns
+    -------
+    size : int
+        The (estimated) size in bytes.
+    """
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(index=True, deep=True))
+    if isinstance(obj, np.ndarray):
+        size = obj.nbytes
+        if obj.dtype == object:
+            size += sum(sys.getsizeof(i) for i in obj.flat)
+        return size
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(sizeof(i) for i in obj)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(sizeof(i) for i in obj.values())
+
+    # qpcr.Assay objects store their data in a _df attribute
+    df = getattr(obj, "_df", None)
+    if isinstance(df, pd.DataFrame):
+        return sys.getsizeof(obj) + sizeof(df)
+
+    return sys.getsizeof(obj)
+
+
+class LRUCache:
+    """
+    A least-recently-used cache with an optional memory budget.
+
+    Note
+    ----
+    The cache stores the objects themselves, not copies. Hence, any objects
+    retrieved from the cache must not be modified in place!
+
+    Parameters
+    ----------
+    budget : int
+        The maximum total (estimated) size of all entries in bytes.
+        If `None` the cache is not limited by memory.
+    maxsize : int
+        The maximum number of entries. If `None` the cache is not limited
+        by the number of entries.
+    """
+
+    def __init__(self, budget=None, maxsize=None):
+        self._budget = budget
+        self._maxsize = maxsize
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Returns
+        -------
+        value
+            The value stored under the key (this marks the entry as recently used),
+            or `default` if the key is not in the cache.
+        """
+        with self._lock:
+            if key not in self._entries:
+                return default
+            self._entries.move_to_end(key)
+            value, _ = self._entries[key]
+            return value
+
+    def put(self, key, value, size=None):
+        """
+        Stores a value in the cache and evicts the least recently used
+        entries if the cache is now too large.
+
+        Parameters
+        ----------
+        key
+            A hashable key.
+        value
+            The object to store.
+        size : int
+            The size of the object in bytes. If `None` it will be estimated using `sizeof`.
+            Objects that alone exceed the memory budget are not stored at all.
+        """
+        size = sizeof(value) if size is None else size
+        with self._lock:
+            if key in self._entries:
+                self._nbytes -= self._entries.pop(key)[1]
+
+            if self._budget is not None and size > self._budget:
+                return
+
+            self._entries[key] = (value, size)
+            self._nbytes += size
+            self._evict()
+
+    def pop(self, key, default=None):
+        """
+        Removes an entry from the cache and returns its value
+        (or `default` if the key is not in the cache).
+        """
+        with self._lock:
+            if key not in self._entries:
+                return default
+            value, size = self._entries.pop(key)
+            self._nbytes -= size
+            return value
+
+    def clear(self):
+        """
+        Removes all entries from the cache.
+        """
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+    def budget(self, budget=None):
+        """
+        Gets or sets the memory budget in bytes.
+        Setting a new budget immediately evicts entries if necessary.
+        """
+        if budget is None:
+            return self._budget
+        with self._lock:
+            self._budget = budget
+            self._evict()
+
+    def nbytes(self):
+        """
+        Returns
+        -------
+        nbytes : int
+            The (estimated) total size of all stored entries in bytes.
+        """
+        return self._nbytes
+
+    def _evict(self):
+        """
+        Drops the least recently used entries until the cache is within its limits.
+        """
+        while self._entries and self._too_large():
+            _, (_, size) = self._entries.popitem(last=False)
+            self._nbytes -= size
+
+    def _too_large(self):
+        """
+        Checks if the cache exceeds its memory budget or number of entries.
+        """
+        too_heavy = self._budget is not None and self._nbytes > self._budget
+        too_many = self._maxsize is not None and len(self._entries) > self._maxsize
+        return too_heavy or too_many
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,242 @@
+"""
+This module defines a batched calibration of qPCR assays.
+
+`qpcr.Calibrator.pipe` calibrates one assay at a time and fits a separate linear regression
+to the dilution series of each assay. Here, the dilution series (log-dilutions vs. Ct values) of all assays
+are first collected, then stacked into padded arrays, and the regressions of all assays are solved at once.
+Assays with a known efficiency (e.g. from a reference file) are assigned their efficiency just like before.
+
+The calibration mode can be set through the environment variable:
+
+QUPID_CALIBRATION           either `batch` (default) or `pipe` (calibrate one assay at a time using `qpcr.Calibrator.pipe`)
+
+Note
+----
+The batched calibration computes the same efficiencies and records the same computed values
+(the dilution series and their regression lines) in the Calibrator as `qpcr.Calibrator.pipe`.
+"""
+
+import os
+from collections import namedtuple
+
+import numpy as np
+import qpcr.defaults as defaults
+import qpcr._auxiliary.warnings as aw
+from scipy import stats as scistats
+
+calibration_mode = os.environ.get("QUPID_CALIBRATION", "batch")
+
+
+Regression = namedtuple("Regression", ["slope", "intercept", "rvalue", "pvalue", "stderr", "intercept_stderr"])
+"""
+The linear regression of a dilution series (with the same fields as `scipy.stats.linregress`).
+"""
+
+
+def pipe(calibrator, assays, remove_calibrators=True, ignore_uncalibrated=False):
+    """
+    Calibrates a list of assays (the batched equivalent of `qpcr.Calibrator.pipe`).
+
+    Parameters
+    ----------
+    calibrator : qpcr.Calibrator
+        The Calibrator. Any efficiencies it already holds are assigned, all other efficiencies
+        are computed (and added to the Calibrator).
+    assays : list
+        The qpcr.Assays to calibrate.
+    remove_calibrators : bool
+        Remove the calibrator replicates after assignment or efficiency calculation.
+    ignore_uncalibrated : bool
+        Ignore assays that could neither be newly calibrated nor be assigned an existing efficiency.
+        Otherwise, a `CalibratorError` is raised.
+
+    Returns
+    -------
+    assays : list
+        The calibrated assays.
+    """
+    # first assign any known efficiencies and collect the dilution series of all other assays
+    series = []
+    for assay in assays:
+        if calibrator._get_efficiency(assay) is not None:
+            calibrator.assign(assay, remove_calibrators=remove_calibrators)
+            continue
+        try:
+            series.append((assay, *dilution_series(calibrator, assay)))
+        except Exception:
+            calibrator._reset_dilution()
+            _uncalibrated(assay, ignore_uncalibrated)
+
+    if len(series) == 0:
+        return assays
+
+    # now fit the regressions of all dilution series at once
+    regressions = regress([i[1] for i in series], [i[2] for i in series])
+    efficiencies = compute_efficiencies(regressions.slope)
+
+    for idx, (assay, dilutions, cts, df, has_calibrators) in enumerate(series):
+
+        # series without a valid regression (e.g. all with the same dilution) cannot be calibrated
+        if not np.isfinite(efficiencies[idx]):
+            _uncalibrated(assay, ignore_uncalibrated)
+            continue
+
+        regression = Regression(*(float(i[idx]) for i in regressions))
+        assay.efficiency(efficiencies[idx])
+        calibrator._eff_dict[assay.id()] = assay.efficiency()
+        calibrator._save_computation(assay, dilutions, cts, regression)
+
+        # the calibrators are only removed if there were any (otherwise the entire assay was used)
+        if has_calibrators and remove_calibrators:
+            calibrator._remove_calibrators(assay, df)
+
+    return assays
+
+
+def has_calibrators(calibrator, assay):
+    """
+    Checks if an assay has calibrator replicates (i.e. groups named with the calibrator prefix).
+
+    Returns
+    -------
+    has_calibrators : bool
+        True if the assay has calibrator replicates.
+    """
+    names = assay.names(as_set=False).unique()
+    return any(calibrator._has_calibrator_prefix(i) for i in names)
+
+
+def dilution_series(calibrator, assay):
+    """
+    Gets the dilution series of an assay (just like `qpcr.Calibrator.calibrate`).
+    If an assay has no calibrator replicates, the entire assay is used as dilution series.
+
+    Parameters
+    ----------
+    calibrator : qpcr.Calibrator
+        The Calibrator (which infers or generates the dilution steps).
+    assay : qpcr.Assay
+        The assay.
+
+    Returns
+    -------
+    dilutions : np.ndarray
+        The log-scaled dilutions.
+    cts : np.ndarray
+        The Ct values (sorted).
+    df : pd.DataFrame
+        The replicates of the dilution series (with their original index in an `orig_index` column).
+    has_calibrators : bool
+        True if the assay has calibrator replicates.
+    """
+    names = assay.names(as_set=False).unique()
+    calibrators = np.array([calibrator._has_calibrator_prefix(i) for i in names])
+    has_calibrators = any(calibrators)
+
+    df = assay.get()
+    if has_calibrators:
+        df = calibrator._subset_calibrators(names, calibrators, df)
+
+    # drop missing Ct values and sort by Ct values (as they need to increase along the dilution series)
+    ct_name = defaults.raw_col_names[1]
+    df = df[df[ct_name] == df[ct_name]]
+    df = df.sort_values(ct_name).reset_index()
+    df = df.rename(columns={"index": "orig_index"})
+
+    if not calibrator._manual_dilution_set:
+        dilutions = calibrator._infer_dilution_steps(df)
+    else:
+        dilutions = calibrator._generate_dilution_steps(df)
+
+    cts = df[ct_name].to_numpy()
+    return dilutions, cts, df, has_calibrators
+
+
+def regress(xs, ys):
+    """
+    Fits a linear regression to each of a number of series at once.
+
+    Parameters
+    ----------
+    xs : list
+        The x-values of each series (arrays of possibly different lengths).
+    ys : list
+        The y-values of each series.
+
+    Returns
+    -------
+    regressions : Regression
+        The regressions of all series (each field is an array with one value per series).
+        Series that have fewer than two values or only a single distinct x-value have missing values.
+    """
+    # stack all series into padded arrays (the padding is masked out)
+    lengths = np.array([len(i) for i in xs])
+    mask = np.arange(max(lengths.max(), 1)) < lengths[:, None]
+
+    x = np.zeros(mask.shape)
+    y = np.zeros(mask.shape)
+    x[mask] = np.concatenate(xs)
+    y[mask] = np.concatenate(ys)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+
+        # the (centered) sums of squares of all series
+        n = lengths.astype(float)
+        x_mean = x.sum(axis=1) / n
+        y_mean = y.sum(axis=1) / n
+        dx = np.where(mask, x - x_mean[:, None], 0)
+        dy = np.where(mask, y - y_mean[:, None], 0)
+        ssx = (dx ** 2).sum(axis=1)
+        ssy = (dy ** 2).sum(axis=1)
+        ssxy = (dx * dy).sum(axis=1)
+
+        # the least-squares lines and their correlation coefficients
+        slope = ssxy / ssx
+        intercept = y_mean - slope * x_mean
+        rvalue = np.where(ssy == 0, 0.0, ssxy / np.sqrt(ssx * ssy))
+        rvalue = np.clip(rvalue, -1, 1)
+
+        # the significance and standard errors (just like scipy.stats.linregress)
+        dof = n - 2
+        tiny = 1.0e-20
+        tvalue = rvalue * np.sqrt(dof / ((1 - rvalue + tiny) * (1 + rvalue + tiny)))
+        pvalue = 2 * scistats.t.sf(np.abs(tvalue), np.maximum(dof, 1))
+        stderr = np.sqrt((1 - rvalue ** 2) * ssy / ssx / dof)
+        intercept_stderr = stderr * np.sqrt(ssx / n + x_mean ** 2)
+
+    # two values always lie on a perfect line
+    pair = n == 2
+    pvalue = np.where(pair, np.where(ssy == 0, 1.0, 0.0), pvalue)
+    stderr = np.where(pair, 0.0, stderr)
+    intercept_stderr = np.where(pair, 0.0, intercept_stderr)
+
+    invalid = (n < 2) | (ssx == 0)
+    fields = (slope, intercept, rvalue, pvalue, stderr, intercept_stderr)
+    return Regression(*(np.where(invalid, np.nan, i) for i in fields))
+
+
+def compute_efficiencies(slopes):
+    """
+    Computes efficiencies from the slopes of dilution series regressions (see `qpcr.Calibrator._compute_efficiency`).
+
+    Parameters
+    ----------
+    slopes : np.ndarray
+        The slopes of the regressions of Ct values vs. log-dilutions.
+
+    Returns
+    -------
+    efficiencies : np.ndarray
+        The efficiencies (rounded to four decimals).
+    """
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        efficiencies = np.exp(-1 / slopes) - 1
+    return np.round(efficiencies, 4)
+
+
+def _uncalibrated(assay, ignore_uncalibrated):
+    """
+    Handles an assay that could not be calibrated (raises a `CalibratorError` unless it should be ignored).
+    """
+    if not ignore_uncalibrated:
+        raise aw.CalibratorError("cannot_process_assay", id=assay.id())
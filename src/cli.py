@@ -0,0 +1,260 @@
+"""
+This module defines a command line interface to run Qupid's analysis without streamlit (e.g. in batch jobs).
+
+Each experiment is described by a session log as downloaded from the app (`Download Session Log`),
+which specifies all settings as well as the names of the input datafiles. The input datafiles are looked
+up in a given directory. Any number of experiments can be run at once, using a pool of processes.
+
+For each experiment a directory (named after its session log) is created within the output directory,
+which will contain the files that are available for download in the app:
+
+results.csv                 The Delta-Delta-Ct results retaining all individual replicate values
+results_summary.csv         The results summarised to mean and stdev of each replicate group
+all_assays.csv              All assays and normalisers with their Ct, Delta-Ct, and Delta-Delta-Ct values
+tests_results.csv           The statistical test results (if any tests were performed)
+efficiencies.csv            All efficiencies (if any new efficiencies were computed)
+
+Usage
+-----
+python cli.py session_log.json [session_log2.json ...] --inputs data/ --outdir results/
+"""
+
+import argparse
+import ast
+import json
+import os
+import re
+import sys
+import traceback
+
+import Qupid as qu
+import controls as ctrl
+import core
+import parallel
+
+
+# the settings that refer to input datafiles
+file_settings = ("assay_files", "normaliser_files", "efficiency_reference_file")
+
+# the session log stores any values as strings, files as the repr of an UploadedFile.
+# Only the values of these settings are converted back to python objects (e.g. tuples or numbers),
+# while any other settings only convert True, False and None.
+literal_settings = ("col", "replicates", "inclusion_range", "selected_pairs", "calibration_dilution", "workers")
+literal_prefixes = ("permutate_",)
+constants = {"True": True, "False": False, "None": None}
+
+# settings that are always strings (e.g. column names may well look like numbers)
+string_settings = ("sheet_name", "id_col", "ct_col", "assay_col", "names", "delimiter", "assay_pattern", "primer_set")
+
+file_name_pattern = re.compile(r"name='([^']*)'")
+log_line_pattern = re.compile(r'^\s*"(.*?)"\s*:\s*"(.*)",?\s*$')
+
+
+def load_session_log(filename, inputs):
+    """
+    Loads a session log and converts it back to session settings.
+
+    Parameters
+    ----------
+    filename : str
+        The path to the session log file.
+    inputs : str
+        The directory in which to look for the input datafiles.
+
+    Returns
+    -------
+    settings : dict
+        The session settings.
+    """
+    with open(filename, "r") as f:
+        content = f.read()
+
+    # the session log is not always valid json (e.g. if values contain quotes or backslashes)
+    # so we fall back to reading it line by line
+    try:
+        log = json.loads(content, strict=False)
+    except json.JSONDecodeError:
+        log = [log_line_pattern.match(i) for i in content.split("\n")]
+        log = {i.group(1): i.group(2) for i in log if i is not None}
+
+    settings = {key: _decode(key, value) for key, value in log.items()}
+
+    for key in file_settings:
+        if key in settings:
+            settings[key] = _load_files(settings[key], inputs)
+
+    return settings
+
+
+def run_experiment(filename, inputs, outdir, overrides=None):
+    """
+    Runs the analysis of a single experiment and saves its results.
+
+    Parameters
+    ----------
+    filename : str
+        The path to the experiment's session log file.
+    inputs : str
+        The directory in which to look for the input datafiles.
+    outdir : str
+        The directory in which to save the results.
+    overrides : dict
+        Any settings to use instead of the ones from the session log.
+
+    Returns
+    -------
+    summary : dict
+        The experiment name, the directory of its results, and an error message (if it failed).
+    """
+    name = os.path.splitext(os.path.basename(filename))[0]
+    directory = os.path.join(outdir, name)
+    summary = dict(experiment=name, directory=directory, error=None)
+
+    try:
+        settings = load_session_log(filename, inputs)
+        settings.update(overrides or {})
+
+        # use a fresh session for each experiment
+        qu.use_session_state(settings)
+
+        core.read()
+        if len(ctrl.session("assays")) == 0 or len(ctrl.session("normalisers")) == 0:
+            raise ValueError("No assays and/or normalisers could be identified with the given settings.")
+
+        core.run_ddCt()
+        save_results(directory)
+
+    # anything the app would report to the user (and stop at)
+    # is raised as a controls.StopError when running headless
+    except Exception as e:
+        summary["error"] = "".join(traceback.format_exception_only(type(e), e)).strip()
+
+    finally:
+        qu.use_session_state(None)
+
+    return summary
+
+
+def save_results(directory):
+    """
+    Saves the results of the analysis in the current session to a directory.
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    ctrl.session("results_df").to_csv(os.path.join(directory, "results.csv"), index=False)
+    ctrl.session("results_stats").to_csv(os.path.join(directory, "results_summary.csv"), index=False)
+
+    with open(os.path.join(directory, "all_assays.csv"), "wb") as f:
+        f.write(ctrl.all_assays_file())
+
+    test_results = ctrl.session("test_results")
+    if test_results:
+        test_results.to_df().to_csv(os.path.join(directory, "tests_results.csv"), index=False)
+
+    if ctrl.calibrated_new():
+        with open(os.path.join(directory, "efficiencies.csv"), "w") as f:
+            f.write(ctrl.calibrations_to_df())
+
+
+def _run(job):
+    """
+    Runs a single experiment job of (filename, inputs, outdir, overrides).
+    """
+    return run_experiment(*job)
+
+
+def _decode(key, value):
+    """
+    Converts a string value of a setting from the session log back to a python object (if it is not a string setting).
+    """
+    if not isinstance(value, str):
+        return value
+
+    # unset settings are logged as None
+    if key in string_settings:
+        if value == "None":
+            return None
+        if key == "names":
+            return _decode_names(value)
+        return value
+
+    if key in literal_settings or key.startswith(literal_prefixes):
+        try:
+            return ast.literal_eval(value)
+        except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+            return value
+
+    return constants.get(value, value)
+
+
+def _decode_names(value):
+    """
+    Converts the group names from the session log (a list of names) back to a list of strings.
+    Plain comma-separated names are split just like in the app.
+    """
+    if value.startswith("[") and value.endswith("]"):
+        try:
+            return [str(i) for i in ast.literal_eval(value)]
+        except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+            value = value[1:-1]
+    return [i.strip() for i in value.split(",")]
+
+
+def _load_files(value, inputs):
+    """
+    Loads the input datafiles referenced by a session log value.
+    This may either be a (list of) UploadedFile repr(s) or plain filename(s).
+    """
+    if value is None:
+        return None
+
+    is_list = isinstance(value, (list, tuple))
+    if isinstance(value, str):
+        names = file_name_pattern.findall(value)
+        is_list = value.startswith("[")
+        names = names if len(names) > 0 else [value]
+    else:
+        names = list(value)
+
+    files = [qu.LocalFile(os.path.join(inputs, i)) for i in names]
+    if is_list:
+        return files
+    return files[0] if len(files) > 0 else None
+
+
+def _parse_override(string):
+    """
+    Parses a `key=value` override from the command line.
+    """
+    key, _, value = string.partition("=")
+    key = key.strip()
+    return key, _decode(key, value.strip())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run Qupid's Delta-Delta-Ct analysis on one or more experiments without streamlit.")
+    parser.add_argument("logs", nargs="+", help="The session log file(s) of the experiment(s) to run.")
+    parser.add_argument("-i", "--inputs", default=".", help="The directory containing the input datafiles (default is the current directory).")
+    parser.add_argument("-o", "--outdir", default="qupid_results", help="The directory to save the results in (default is 'qupid_results').")
+    parser.add_argument("-p", "--processes", type=int, default=None, help="The number of experiments to run concurrently (default is the number of CPUs).")
+    parser.add_argument("-s", "--set", action="append", default=[], metavar="KEY=VALUE", help="Overrides a setting from the session log(s). May be given multiple times.")
+    args = parser.parse_args(argv)
+
+    overrides = dict(_parse_override(i) for i in args.set)
+    jobs = [(i, args.inputs, args.outdir, overrides) for i in args.logs]
+
+    summaries = parallel.pmap(_run, jobs, workers=args.processes, mode="process")
+
+    failed = 0
+    for summary in summaries:
+        if summary["error"] is None:
+            print(f"{summary['experiment']}: results saved to {summary['directory']}")
+        else:
+            failed += 1
+            print(f"{summary['experiment']}: failed ({summary['error']})", file=sys.stderr)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,12 +6,19 @@ on the different user inputs etc. ...
 import streamlit as st
 import qpcr
 import Qupid as qu
+import exports
+import tables
+import efficiencies
 
 from itertools import combinations
 from copy import deepcopy
 from datetime import datetime
 import pandas as pd
 
+# the maximum number of permutations for permutative normalisation
+# (these are computed in batch, so the cost grows only linearly)
+max_permutations = 10000
+
 
 def add_figure(fig, container, mode):
     """
@@ -28,19 +35,41 @@ def session(key, value=None, reset=False, rm=False):
     Adds a variable to the st.session_state or gets it.
     It returns None by default if the variable is not in session_state.
     """
+    state = qu.session_state()
     if rm:
-        return st.session_state.pop(key, value)
+        return state.pop(key, value)
 
     if value is not None:
-        st.session_state[key] = value
-    elif key in st.session_state and value is None and not reset:
-        return st.session_state[key]
-    elif key in st.session_state and reset:
-        st.session_state[key] = None
-    elif key not in st.session_state:
+        state[key] = value
+    elif key in state and value is None and not reset:
+        return state[key]
+    elif key in state and reset:
+        state[key] = None
+    elif key not in state:
         return None
 
 
+class StopError(Exception):
+    """
+    An error that stops the analysis outside of a streamlit script run (instead of `st.stop`).
+    """
+    pass
+
+
+def stop(*messages):
+    """
+    Shows error messages (if any) and stops the script run.
+
+    Outside of a streamlit script run (e.g. from the command line) `st.stop` does not
+    reliably interrupt the code, so a `StopError` with the messages is raised instead.
+    """
+    for message in messages:
+        st.error(message)
+    if qu.is_headless():
+        raise StopError("\n\n".join(messages) or "The analysis was stopped.")
+    st.stop()
+
+
 # set up a QupidReader to help with deciding which input widgets to display
 reader = qu.QupidReader()
 session("ControlsReader", reader)
@@ -70,10 +99,9 @@ def vet_input_data():
 
     # generate some error messages if it's not all good
     if not all_good:
-        st.error("Qupid did not find input data so far! Make sure to upload something before hitting the 'Read' Button.")
         if session("upload_type") == "multiple files":
             st.warning("Since you are running on multiple input files, make sure to have uploaded to both the Assay and Normaliser input fields!")
-        st.stop()
+        stop("Qupid did not find input data so far! Make sure to upload something before hitting the 'Read' Button.")
 
     return all_good
 
@@ -253,9 +281,9 @@ def setup_multi_assay_file(container, build=False):
                 # sheet name between files...
                 session("sheet_name", reset=True)
 
-                # read the file and check
+                # read the sheet names and check
                 # for multisheet
-                reader.read_excel()
+                reader.read_sheetnames()
 
                 if reader.is_multisheet():
 
@@ -280,6 +308,45 @@ def setup_multi_assay_file(container, build=False):
                         session("sheet_name", sheet_name)
 
 
+def paged_table(container, df, key):
+    """
+    Sets up a paged table with controls to filter and sort its rows.
+    Only the rows of the current page are sent to the browser.
+
+    Parameters
+    ----------
+    container
+        The container to place the table in.
+    df : pd.DataFrame
+        The table.
+    key : str
+        A unique name of the table (used for the keys of its controls).
+    """
+    filter_col, sort_col, order_col, size_col, page_col = container.columns((3, 2, 1, 1, 1))
+
+    text = filter_col.text_input("Filter rows", key=f"{key}_filter", help="Only show rows that contain this text in any column.")
+    by = sort_col.selectbox("Sort by", [None] + list(df.columns), format_func=lambda x: "-" if x is None else str(x), key=f"{key}_sort")
+    descending = order_col.selectbox("Order", ["ascending", "descending"], key=f"{key}_order") == "descending"
+    size = size_col.selectbox("Rows per page", tables.page_sizes, key=f"{key}_size")
+
+    rows = tables.sort_rows(tables.filter_rows(df, text), by, descending)
+    pages = tables.n_pages(len(rows), size)
+
+    # the page is only set through the session (the widget has no default value)
+    # and filtering may leave fewer pages than the currently selected one
+    if session(f"{key}_page") is None:
+        session(f"{key}_page", 1)
+    elif session(f"{key}_page") > pages:
+        session(f"{key}_page", pages)
+    number = page_col.number_input("Page", min_value=1, max_value=pages, step=1, key=f"{key}_page")
+
+    container.table(tables.page(rows, number, size))
+
+    start = (number - 1) * size
+    filtered = f" (filtered from {len(df)})" if len(rows) != len(df) else ""
+    container.caption(f"Rows {min(start + 1, len(rows))}-{min(start + size, len(rows))} of {len(rows)}{filtered}, page {number} of {pages}")
+
+
 def setup_ref_col_input(container):
     """
     Sets up a number input for the column to use while searching for
@@ -399,9 +466,9 @@ def setup_bigtable_file(container, build=False):
             # first check if it's an excel file
             if reader.is_excel():
 
-                # read the file and check
+                # read the sheet names and check
                 # for multisheet
-                reader.read_excel()
+                reader.read_sheetnames()
                 session("sheet_name", reader.sheets()[0])
                 if reader.is_multisheet():
 
@@ -484,17 +551,26 @@ def setup_normaliser_mode(container):
     # special settings for permutative normalisation
     session("permutate_stack", rm=True)
     session("permutate_replace", rm=True)
+    session("permutate_seed", rm=True)
     if normalisation_mode == "permutative":
         stacks = container.number_input(
             "Number of permutations",
             help="Select the number of times permutations should be repeated. This will generate `n * k` data points where `n` is the number of entries in the assay datasets and `k` the number of chosen repeats.",
             min_value=1,
-            max_value=100,
+            max_value=max_permutations,
             value=1,
         )
         session("permutate_stack", stacks)
         allow_replace = container.checkbox("Allow replacement", help="Select this if you wish to allow replacement during the permutation process.", value=False)
         session("permutate_replace", allow_replace)
+        seed = container.number_input(
+            "Random seed",
+            help="The seed for the random permutations. The same seed will always generate the same permutations, so the results can be reproduced.",
+            min_value=0,
+            value=qpcr.defaults.seed,
+            step=1,
+        )
+        session("permutate_seed", int(seed))
     session("normalisation_mode", normalisation_mode)
 
 
@@ -567,8 +643,7 @@ def setup_plotting_kwargs(container):
     plotting_kwargs = [i for i in plotting_kwargs if i != ""]
     # check if there are any non-standard formatted lines
     if any(["=" not in i for i in plotting_kwargs]):
-        st.error("Something is off with the plotting kwargs, check again to make sure all your lines conform to `var = value` formatting.")
-        st.stop()
+        stop("Something is off with the plotting kwargs, check again to make sure all your lines conform to `var = value` formatting.")
     # link lines again by commas
     plotting_kwargs = ",".join(plotting_kwargs)
 
@@ -645,13 +720,65 @@ def setup_session_log_download(container):
     )
 
 
+def setup_download_format(container):
+    """
+    Sets up a selection of the file format of the table downloads.
+    """
+    download_format = container.selectbox(
+        "Download Format",
+        list(exports.formats),
+        help="The file format of the downloaded tables. `parquet` and `feather` are binary columnar formats that retain the column data types and are much faster to load than `csv` files (e.g. using `pandas.read_parquet` or `pandas.read_feather`).",
+    )
+    session("download_format", download_format)
+
+
+def download_format():
+    """
+    Returns
+    -------
+    fmt : str
+        The selected file format of the table downloads (default is `csv`).
+    """
+    return session("download_format") or "csv"
+
+
+def table_payload(name, version, get_df, metadata=None):
+    """
+    Gets the contents of a table download in the selected file format (see `download_payload`).
+
+    Parameters
+    ----------
+    name : str
+        The name of the download.
+    version : str
+        The results the download depends on.
+    get_df : callable
+        A function that returns the table.
+    metadata : dict
+        Any metadata to store with the table (only for binary formats).
+
+    Returns
+    -------
+    data : str or bytes
+        The contents of the download.
+    file_name : str
+        The filename of the download.
+    mime : str
+        The mime type of the download.
+    """
+    fmt = download_format()
+    data = download_payload(f"{name}.{fmt}", version, lambda: exports.table_file(get_df(), fmt, metadata))
+    return data, f"{name}.{fmt}", exports.formats[fmt]
+
+
 def setup_results_downloads(container):
     """
     Sets up a download button the results with replicates,
     """
     rep_results = session("results_df")
+    data, file_name, mime = table_payload("results", "results", lambda: rep_results)
 
-    container.download_button("Download Results", rep_results.to_csv(index=False), mime="text/csv", help="Download the final Delta-Delta-Ct results retaining all individual replicate values.")
+    container.download_button("Download Results", data, file_name=file_name, mime=mime, help="Download the final Delta-Delta-Ct results retaining all individual replicate values.")
 
 
 def setup_summarised_download(container):
@@ -659,61 +786,116 @@ def setup_summarised_download(container):
     Sets up a download button for the summarised results table.
     """
     stats_results = session("results_stats")
-    container.download_button("Download Summarized Results", stats_results.to_csv(index=False), mime="text/csv", help="Download the final Delta-Delta-Ct results results summarized to mean and stdev of each replicate group.")
+    data, file_name, mime = table_payload("results_summary", "results", lambda: stats_results)
+    container.download_button("Download Summarized Results", data, file_name=file_name, mime=mime, help="Download the final Delta-Delta-Ct results results summarized to mean and stdev of each replicate group.")
 
 
 def onefile_download_all_assays(container):
     """
     Merges all assays into a single (irregular csv)
-    file with all groups, Ct, dCt values etc.
+    file with all groups, Ct, dCt values etc. In the
+    binary formats all assays are stored in a single
+    table with an assay and decorator column instead.
+    """
+    fmt = download_format()
+    if fmt == "csv":
+        total_file = all_assays_file()
+    else:
+        assays, normalisers, input_files = all_assays_inputs()
+        metadata = exports.all_assays_metadata(input_files)
+        total_file, *_ = table_payload("all_assays", "assays", lambda: exports.all_assays_table(assays, normalisers), metadata=metadata)
+
+    # generate a download button
+    container.download_button(
+        "Download all Assays",
+        total_file,
+        file_name=f"all_assays.{fmt}",
+        mime=exports.formats[fmt],
+        help="Merges all datasets into a single file. This will also include the raw Ct values, delta-Ct values, all Delta-Delta-Ct values etc. from all assays, as well as normalisers. As `csv` this is an irregular multi-assay file, in the binary formats all assays are stored in one table with an `assay` and `@qpcr` (assay or normaliser) column.",
+    )
+
+
+def all_assays_file():
+    """
+    Assembles the contents of the single (irregular csv) file
+    of all assays and normalisers. The file is only assembled
+    once for each analysis.
+
+    Returns
+    -------
+    total_file : bytes
+        The file contents.
+    """
+    return download_payload("all_assays", "assays", build_all_assays_file)
+
+
+def build_all_assays_file():
+    """
+    Builds the single (irregular csv) file of all assays and normalisers
+    from the session (see `exports.write_all_assays`).
     """
+    assays, normalisers, input_files = all_assays_inputs()
+    return exports.all_assays_file(assays, normalisers, input_files)
 
+
+def all_assays_inputs():
+    """
+    Returns
+    -------
+    assays : list
+        The computed assays of the session.
+    normalisers : list
+        The normalisers of the session.
+    input_files : list
+        The names of the input datafiles.
+    """
     assays = session("assays_computed")
     normalisers = session("normalisers")
 
-    # assemble a total string of the file
-    total_file = ""
-    header = f"Qupid Analysed Assays\nDate,{datetime.today().strftime('%Y-%m-%d')}\nTime,{datetime.now().strftime('%H:%M:%S')}\n"
-
-    # add input data file names
+    # get the input data file names
     if session("upload_type") == "multiple files":
         input_files = [i.name for i in session("assay_files")] + [i.name for i in session("normaliser_files")]
-        input_files = "\n".join(input_files)
     else:
-        input_files = session("assay_files").name
+        input_files = [session("assay_files").name]
 
-    input_files = f"\nInput Datafile(s):\n{input_files}\n\n"
-    header += input_files
-    total_file += header
+    return assays, normalisers, input_files
 
-    # now add assays and normaliser files (we'll also add the appropriate decorators)
-    new_entry = "{decorator}\n{assay}\n{df}\n\n"
 
-    decorator = qpcr.Parsers.plain_decorators["qpcr:assay"]
-    for assay in assays:
+def download_payload(name, version, build):
+    """
+    Gets the contents of a download, which are only built anew
+    if the results they depend on changed since they were last built.
 
-        df = assay.get()
-        df = df.to_csv(index=False)
-        id = assay.id()
+    Parameters
+    ----------
+    name : str
+        The name of the download.
+    version : str
+        The results the download depends on (any key of the session's `result_versions`).
+    build : callable
+        A function that builds the download's contents.
 
-        total_file += new_entry.format(decorator=decorator, assay=id, df=df)
+    Returns
+    -------
+    data
+        The contents of the download.
+    """
+    versions = session("result_versions") or {}
+    key = versions.get(version)
 
-    decorator = qpcr.Parsers.plain_decorators["qpcr:normaliser"]
-    for assay in normalisers:
+    payloads = session("download_payloads")
+    if payloads is None:
+        payloads = {}
+        session("download_payloads", payloads)
 
-        df = assay.get()
-        df = df.to_csv(index=False)
-        id = assay.id()
+    # without a known version we cannot tell if the results changed
+    cached = payloads.get(name)
+    if key is not None and cached is not None and cached[0] == key:
+        return cached[1]
 
-        total_file += new_entry.format(decorator=decorator, assay=id, df=df)
-
-    # generate a download button
-    container.download_button(
-        "Download all Assays",
-        total_file,
-        file_name="all_assays.csv",
-        help="Merges all datasets into a single irregular multi-assay `csv` file. This will also include the raw Ct values, delta-Ct values, all Delta-Delta-Ct values etc. from all assays, as well as normalisers.",
-    )
+    data = build()
+    payloads[name] = (key, data)
+    return data
 
 
 def setup_tests_download(container):
@@ -722,7 +904,8 @@ def setup_tests_download(container):
     """
     tests_results = session("test_results")
     if tests_results:
-        container.download_button("Download Tests Results", tests_results.to_df().to_csv(index=False), mime="text/csv", help="Download the statistical test results.")
+        data, file_name, mime = table_payload("tests_results", "tests", tests_results.to_df)
+        container.download_button("Download Tests Results", data, file_name=file_name, mime=mime, help="Download the statistical test results.")
 
 
 def vet_all_assays_grouped():
@@ -745,7 +928,7 @@ def vet_all_assays_grouped():
 
         # write error
         error_string += perhaps_why
-        st.error(error_string)
+        errors = [error_string]
 
         # check for the assay lengths ( add info
         # if at least one is of different length )
@@ -753,12 +936,12 @@ def vet_all_assays_grouped():
         length_good = groups[0].n()
         same_length = all([i.n() == length_good for i in no_groups])
         if not same_length:
-            st.error(
+            errors.append(
                 "At least one of the above assays does not have the same number of replicate entries as the others! Make sure that all assays have the same length (add dummy groups if necessary). Or, manually adjust replicate identifiers to allow automatic inference of replicates."
             )
 
         # stop here
-        st.stop()
+        stop(*errors)
 
 
 def found_assays_message():
@@ -768,8 +951,7 @@ def found_assays_message():
     """
     # check if we got both assays and normalisers
     if len(session("assays")) == 0 or len(session("normalisers")) == 0:
-        st.error("No assays and/or normalisers could be identified with the given settings. Make sure you have decorated your data and provide the correct `col` argument (column or row in which to search).")
-        st.stop()
+        stop("No assays and/or normalisers could be identified with the given settings. Make sure you have decorated your data and provide the correct `col` argument (column or row in which to search).")
     else:
         st.success(
             """
@@ -797,13 +979,25 @@ def make_session_log():
     # get the session_state
     # we manually copy as deepcopy did not work for the session_state
     # and so processing also affected the original dict...
-    log = {i: j for i, j in st.session_state.items()}
+    log = {i: j for i, j in qu.session_state().items()}
 
     # specify the keys to remove
     to_remove = []
 
     if "ControlsReader" in log.keys():
         to_remove.append("ControlsReader")
+    if "raw_store" in log.keys():
+        to_remove.append("raw_store")
+    if "stage_graph" in log.keys():
+        to_remove.append("stage_graph")
+    if "download_payloads" in log.keys():
+        to_remove.append("download_payloads")
+    if "result_versions" in log.keys():
+        to_remove.append("result_versions")
+    if "profiler" in log.keys():
+        to_remove.append("profiler")
+    if "figure_cache" in log.keys():
+        to_remove.append("figure_cache")
 
     # remove results (they are not meta-data)
     if "results" in log.keys():
@@ -843,6 +1037,11 @@ def make_session_log():
     if "drop_rel" in log.keys():
         log.pop("drop_rel")
 
+    # add the time (and memory) spent on each stage
+    profiler = session("profiler")
+    if profiler:
+        log["performance"] = profiler.records(digits=4)
+
     # and now add ticks to make proper formatted...
     log = {f"\"{key}\"": f"\"{value}\"" for key, value in log.items()}
     return log
@@ -868,6 +1067,20 @@ def setup_calibration_Settings(container):
         "Upload an efficiency reference file", help="If you have pre-computed qPCR primer efficiencies stored in a `csv` file you can upload them here. Note, this file must contain exactly two (named) columns containing assay ids and efficiencies."
     )
     session("efficiency_reference_file", efficiency_reference_file)
+
+    # efficiencies of previous sessions can be taken from the efficiency store
+    if efficiencies.store_path:
+        use_store = container.checkbox(
+            "Use efficiency store",
+            value=False,
+            help=f"Assign efficiencies that were computed in previous sessions (stored at `{efficiencies.store_path}`) to assays without calibrator replicates, and store any newly computed efficiencies. Assays with calibrator replicates are always calibrated anew, and efficiencies from an uploaded reference file take precedence.",
+        )
+        session("use_efficiency_store", use_store)
+        primer_set = container.text_input("Primer set", help="An optional label of the primers used, to keep efficiencies of different primer sets of the same assay apart in the efficiency store.")
+        session("primer_set", primer_set)
+    else:
+        session("use_efficiency_store", False)
+
     remove_calibrators = container.checkbox("Remove calibrator replicates", help="Remove all calibrator replicates from the Assays after calibration.", value=True)
     session("remove_calibrators", remove_calibrators)
 
@@ -909,7 +1122,7 @@ def setup_download_button_column_number():
 
 def calibrated_new():
     calibrator = session("Calibrator")
-    if calibrator is not None and calibrator.computed_values() != {}:
+    if calibrator is not None and calibrator._computed_values != {}:
         return True
     return False
 
@@ -924,9 +1137,10 @@ def calibration_download_button(container):
         filename = efficiency_reference_file.name.split("/")[-1]
     else:
         filename = "efficiencies.csv"
+    data = download_payload("efficiencies", "calibration", calibrations_to_df)
     container.download_button(
         "Download Efficiency Table",
-        calibrations_to_df(),
+        data,
         file_name=filename,
         mime="text/csv",
         help="Download all currently stored qPCR primer efficiencies. This will include all efficiencies that were previously loaded as well as any newly computed ones. This file can be loaded as a new reference file in the future.",
@@ -937,7 +1151,7 @@ def calibrations_to_df():
     """
     Converts the calibration efficiency dict to a dataframe
     """
-    df = session("Calibrator").efficiencies()
+    df = session("Calibrator")._eff_dict
     df = pd.DataFrame(df, index=["eff"])
     df = df.transpose().reset_index()
     df = df.to_csv(index=False)
@@ -5,17 +5,125 @@ files and compute Delta-Delta-Delta-Ct
 
 import streamlit as st
 import qpcr
-import qpcr.stats as qstats
 import qpcr._auxiliary as aux
 import qpcr.defaults as defaults
 import controls as ctrl
 from controls import add_figure, session
 import Qupid as qu
-
-from copy import deepcopy
+import parallel
+import snapshot
+import stages
+import profiling
+import permutation
+import cache
+import summaries
+import batchstats
+import efficiencies
+import calibration
+import filtering
+
+import os
+import sqlite3
+import pandas as pd
+from copy import copy
+from functools import wraps
 import datetime
 
+# the maximum number of rendered figures to keep per session (figures of
+# many assays are large, so only the most recently used ones are kept)
+figure_cache_size = int(os.environ.get("QUPID_FIGURE_CACHE", 8))
+
+
+def get_profiler():
+    """
+    Gets the Profiler of the session (and sets one up if there is none yet).
+
+    Returns
+    -------
+    profiler : profiling.Profiler
+        The session's Profiler.
+    """
+    profiler = session("profiler")
+    if profiler is None:
+        profiler = profiling.Profiler()
+        session("profiler", profiler)
+
+    # users may opt in to tracing memory
+    if session("profile_memory") is not None:
+        profiler.memory = session("profile_memory")
+    return profiler
+
+
+def profiled(stage):
+    """
+    Decorates a workflow function so that it is recorded as a stage by the session's Profiler.
+
+    Parameters
+    ----------
+    stage : str
+        The name of the stage.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with get_profiler().profile(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def get_figure_cache():
+    """
+    Gets the figure cache of the session (and sets one up if there is none yet).
+
+    Returns
+    -------
+    figure_cache : cache.LRUCache
+        The session's figure cache.
+    """
+    figure_cache = session("figure_cache")
+    if figure_cache is None:
+        figure_cache = cache.LRUCache(maxsize=figure_cache_size)
+        session("figure_cache", figure_cache)
+    return figure_cache
+
 
+def cached_figure(name, version, render, **params):
+    """
+    Gets a rendered figure from the session's figure cache,
+    or renders it if its data or settings changed.
+
+    Parameters
+    ----------
+    name : str
+        The name of the figure.
+    version
+        Any identifier of the data shown in the figure.
+        If `None` the figure is always rendered anew.
+    render : callable
+        A function that renders the figure.
+    **params
+        The settings the figure was rendered with.
+
+    Returns
+    -------
+    fig
+        The rendered figure.
+    """
+    if version is None:
+        return render()
+
+    figure_cache = get_figure_cache()
+    key = cache.fingerprint(name, version, **params)
+    fig = figure_cache.get(key)
+    if fig is None:
+        fig = render()
+        # the size of figures cannot be estimated, so the cache is only bound by the number of figures
+        figure_cache.put(key, fig, size=0)
+    return fig
+
+
+@profiled("read")
 def read():
     """
     The main workflow that will read the upoaded datafile(s)
@@ -25,6 +133,10 @@ def read():
     # get the input type
     input_type = session("upload_type")
 
+    # any records of previous data are meaningless now
+    profiler = get_profiler()
+    profiler.clear()
+
     # set up a new QupidReader
     Qreader = qu.QupidReader()
 
@@ -32,8 +144,8 @@ def read():
     if input_type == "multiple files":
 
         # get the datacolumns in case there are more than two
-        id_col = aux.from_kwargs("id_col", defaults.id_header, st.session_state, rm=True)
-        ct_col = aux.from_kwargs("ct_col", defaults.ct_header, st.session_state, rm=True)
+        id_col = aux.from_kwargs("id_col", defaults.id_header, qu.session_state(), rm=True)
+        ct_col = aux.from_kwargs("ct_col", defaults.ct_header, qu.session_state(), rm=True)
 
         # read regular csv file lists
         assay_files = session("assay_files")
@@ -41,7 +153,8 @@ def read():
         for assay in assay_files:
 
             # read the file
-            assay = Qreader.SingleReader_read_regular(assay, id_label=id_col, ct_label=ct_col)
+            with profiler.profile("read", assay=assay.name):
+                assay = Qreader.SingleReader_read_regular(assay, id_label=id_col, ct_label=ct_col)
             assays.append(assay)
 
         # now read the normalisers the same way
@@ -49,7 +162,8 @@ def read():
         normalisers = []
         for assay in normaliser_files:
 
-            assay = Qreader.SingleReader_read_regular(assay, id_label=id_col, ct_label=ct_col)
+            with profiler.profile("read", assay=assay.name):
+                assay = Qreader.SingleReader_read_regular(assay, id_label=id_col, ct_label=ct_col)
             normalisers.append(assay)
 
     # reading a single multi assay file
@@ -66,7 +180,7 @@ def read():
         # file and check for multi-sheet-ness
         Qreader.link(file)
         if Qreader.is_excel():
-            Qreader.read_excel()
+            Qreader.read_sheetnames()
 
         # check if we're supposed to read all sheets of a multi-assay file
         # if it is one at all...
@@ -74,17 +188,15 @@ def read():
 
             try:
                 assays, normalisers = Qreader.MultiSheetReader_read(file, col=col)
-            except:
-                st.error("No assays could be identified with the given settings!\nMake sure your file is decorated and you supply the right search parameters.")
-                st.stop()
+            except Exception:
+                ctrl.stop("No assays could be identified with the given settings!\nMake sure your file is decorated and you supply the right search parameters.")
         else:
 
             # read a single data_sheet
             try:
                 assays, normalisers = Qreader.MultiReader_read(file, col=col)
-            except:
-                st.error("No assays could be identified with the given settings!\nMake sure your file is decorated and you supply the right search parameters.")
-                st.stop()
+            except Exception:
+                ctrl.stop("No assays could be identified with the given settings!\nMake sure your file is decorated and you supply the right search parameters.")
 
     # reading a big table file
     elif input_type == "big table":
@@ -94,132 +206,560 @@ def read():
 
         assays, normalisers = Qreader.BigTableReader_read(file)
 
+    else:
+        ctrl.stop(f"Unknown upload type `{input_type}`! Choose to upload either multiple files, a multi assay file, or a big table file.")
+
+    # store the raw data (this must never be modified,
+    # any analysis works on copy-on-write views of it)
+    store = session("raw_store")
+    if store is None:
+        store = snapshot.RawStore()
+        session("raw_store", store)
+    store.set(assays, normalisers)
+
     # store in session
     session("assays", assays)
     session("normalisers", normalisers)
 
 
+@profiled("analysis (total)")
 def run_ddCt():
     """
-    Sets up and runs DeltaDeltaCt analysis and stores results to the session
+    Sets up and runs DeltaDeltaCt analysis and stores results to the session.
+
+    The analysis is run as a graph of stages (filter -> calibrate -> analyse -> normalise -> finalise -> statistics)
+    and only those stages whose inputs or settings changed since the last run are actually recomputed.
     """
+    graph = session("stage_graph")
+    if graph is None:
+        graph = stages.StageGraph()
+        session("stage_graph", graph)
 
-    # get the assays
-    assays = deepcopy(session("assays"))
-    normalisers = deepcopy(session("normalisers"))
+    # the raw data are the source of all stages
+    store = session("raw_store")
+    raw = graph.source("raw", store, (id(store), store.version()))
 
-    # add filter
     filter_type = session("filter_type")
-    if filter_type is not None:
-        if filter_type == "Range":
-            Filter = qpcr.Filters.RangeFilter()
-        elif filter_type == "IQR":
-            Filter = qpcr.Filters.IQRFilter()
-
-        # set up inclusion range
-        inclusion_range = session("inclusion_range")
-        lower, upper = inclusion_range
-        lower = abs(lower)  # because filter range is designed for positive values
-        Filter.set_lim(upper=upper, lower=lower)
-
-        # set up plotmode
-        chart_mode = session("chart_mode")
-        Filter.plotmode(chart_mode)
-        Filter.plot_params(show=False)
-
-    # setup the calibrator
     calibrate = session("perform_calibration")
-    if calibrate:
-        calibrator = qpcr.Calibrator()
+    norm_mode = session("normalisation_mode")
 
-        # check if we have a reference file to work with
-        efficiency_file = session("efficiency_reference_file")
-        if efficiency_file is not None:
-            calibrator.load(efficiency_file)
+    # previously computed efficiencies are loaded from the efficiency store
+    efficiency_store = efficiencies.get_store() if calibrate and session("use_efficiency_store") else None
+    primers = session("primer_set") or ""
+    stored = load_stored_efficiencies(efficiency_store, primers)
 
-        # get dilution settings if they should not be inferred.
-        dilution = session("calibration_dilution")
-        if dilution is not None:
-            calibrator.dilution(dilution)
+    # the profiler records each stage that is actually computed
+    # (and the single assays of the concurrent stages)
+    profiler = get_profiler()
+    options = dict(workers=session("workers"), profiler=profiler)
 
-        remove_calibrators = session("remove_calibrators")
+    # run main computation
+    with st.spinner("Running analysis..."):
+        try:
+            filtered = graph.run(
+                "filter",
+                filter_stage,
+                raw,
+                options=options,
+                profiler=profiler,
+                filter_type=filter_type,
+                inclusion_range=session("inclusion_range") if filter_type is not None else None,
+            )
+
+            calibrated = graph.run(
+                "calibrate",
+                calibrate_stage,
+                filtered,
+                options=options,
+                profiler=profiler,
+                calibrate=calibrate,
+                efficiency_file=session("efficiency_reference_file") if calibrate else None,
+                dilution=session("calibration_dilution") if calibrate else None,
+                remove_calibrators=session("remove_calibrators") if calibrate else None,
+                ignore_uncalibratable=session("ignore_uncalibratable") if calibrate else None,
+                stored=stored,
+            )
+
+            analysed = graph.run(
+                "analyse",
+                analyse_stage,
+                calibrated,
+                options=options,
+                profiler=profiler,
+                anchor=session("anchor"),
+                ref_group=session("ref_group"),
+            )
+
+            normalised = graph.run(
+                "normalise",
+                normalise_stage,
+                analysed,
+                profiler=profiler,
+                norm_mode=norm_mode,
+                k=session("permutate_stack") if norm_mode else None,
+                replace=session("permutate_replace") if norm_mode else None,
+                seed=session("permutate_seed") if norm_mode == "permutative" else None,
+            )
+
+            finalised = graph.run(
+                "finalise",
+                finalise_stage,
+                normalised,
+                profiler=profiler,
+                drop_rel=session("drop_rel"),
+            )
+
+            # (the plotting mode only affects the figures, not the filtered data)
+            figures = graph.run(
+                "figures",
+                figures_stage,
+                filtered,
+                profiler=profiler,
+                chart_mode=session("chart_mode") if filter_type is not None else None,
+            )
+
+        except stages.StageError as e:
+            ctrl.stop(str(e))
 
-        # setup which action to perform for
-        ignore_uncalibratable = session("ignore_uncalibratable")
+    # add the Filter to allow
+    # downloading the Filter report
+    Filter = filtered.value[1]
+    if Filter is not None:
+        session("Filter", Filter)
 
-        # and store calibrator in the session
+    # and the Calibrator
+    _, calibrator, from_store = calibrated.value
+    if calibrator is not None:
         session("Calibrator", calibrator)
+        store_new_efficiencies(efficiency_store, calibrator, stored, primers)
+
+    # note which efficiencies were taken from the efficiency store
+    session("stored_efficiencies", from_store)
+
+    results = finalised.value
+    session("results", results)
+    session("results_df", results.get())
+    session("results_stats", results.stats())
+    session("figures", figures.value)
+
+    # and also store the assay copies that
+    # now contain the computed results
+    # We primarily do this to allow repeated analyses without affecting the
+    # already loaded raw data...
+    session("assays_computed", normalised.value[1])
+
+    # the keys of the stages' outputs identify the results
+    # (e.g. so that downloads are only built once for each analysis)
+    session("result_versions", dict(assays=normalised.key, results=finalised.key, calibration=calibrated.key))
+
+    # and finally perform the statistical tests on the new results
+    run_statistics()
+
+
+def load_stored_efficiencies(efficiency_store, primers=""):
+    """
+    Loads the stored efficiencies of the session's assays and normalisers.
+
+    Returns
+    -------
+    stored : dict
+        The stored efficiencies (or None if there is no efficiency store).
+    """
+    if efficiency_store is None:
+        return None
+
+    ids = [i.id() for i in session("assays") + session("normalisers")]
+    try:
+        return efficiency_store.load(ids, primers)
+    except (sqlite3.Error, OSError) as e:
+        st.warning(f"The efficiency store at {efficiency_store.path} could not be read ({e}). All efficiencies are computed anew.")
+        return None
+
+
+def store_new_efficiencies(efficiency_store, calibrator, stored=None, primers=""):
+    """
+    Writes any newly computed efficiencies of a Calibrator back to the efficiency store.
+    """
+    if efficiency_store is None:
+        return
+
+    stored = stored or {}
+    new = {i: calibrator._eff_dict[i] for i in calibrator._computed_values if i in calibrator._eff_dict}
+    new = {i: j for i, j in new.items() if stored.get(i) != j}
+    try:
+        efficiency_store.save(new, primers)
+    except (sqlite3.Error, OSError) as e:
+        st.warning(f"The new efficiencies could not be written to the efficiency store at {efficiency_store.path} ({e}).")
+
+
+def run_statistics():
+    """
+    Runs the statistical tests on the current results and stores the test results to the session.
+
+    The tests are a separate stage of the analysis that is run on every rerun of the app (rather than only
+    through the `Run Analysis` button), so changing the test settings only recomputes the tests.
+    The tests are only recomputed if the results or the test settings changed.
+    """
+    graph = session("stage_graph")
+    finalised = graph.output("finalise") if graph is not None else None
+    if finalised is None:
+        return
+
+    perform_stats = session("perform_stats_tests")
+    profiler = get_profiler()
+
+    # failed tests (e.g. of a stale pair selection) are reported
+    # but the results are still shown (without any test results)
+    try:
+        tested = graph.run(
+            "statistics",
+            statistics_stage,
+            finalised,
+            profiler=profiler,
+            perform=perform_stats,
+            test_mode=session("test_mode") if perform_stats else None,
+            comparison=session("comparison") if perform_stats else None,
+            pairs=session("selected_pairs") if perform_stats else None,
+        )
+    except Exception as e:
+        message = str(e) if isinstance(e, stages.StageError) else f"{type(e).__name__}: {e}"
+        st.error(f"The statistical tests could not be performed ({message}). Please, check the test settings.")
+        session("results", finalised.value)
+        session("test_results", rm=True)
+        versions = session("result_versions") or {}
+        versions.pop("tests", None)
+        session("result_versions", versions)
+        return
+
+    # the results carry the comparisons of the tests (if any were performed)
+    results, test_results = tested.value
+    session("results", results)
+    if perform_stats:
+        session("test_results", test_results)
+    else:
+        session("test_results", rm=True)
+
+    versions = session("result_versions") or {}
+    versions["tests"] = tested.key
+    session("result_versions", versions)
+
+
+def filter_stage(store, filter_type, inclusion_range, workers=None, profiler=None):
+    """
+    Filters the raw assays and normalisers.
+
+    Returns
+    -------
+    assays : tuple
+        The filtered assays and normalisers (lists of qpcr.Assays).
+    Filter : qpcr.Filter
+        The Filter used (or None if no filtering was performed).
+    """
+    # get copy-on-write views of the raw assays. Only the Ct column
+    # is changed in place (by the Filter), any other column is added anew...
+    writable = [defaults.raw_col_names[1]] if filter_type is not None else []
+    assays = store.assays(writable=writable)
+    normalisers = store.normalisers(writable=writable)
+
+    if filter_type is None:
+        return (assays, normalisers), None
+
+    if filter_type == "Range":
+        Filter = qpcr.Filters.RangeFilter()
+    elif filter_type == "IQR":
+        Filter = qpcr.Filters.IQRFilter()
+
+    # set up inclusion range
+    lower, upper = inclusion_range
+    lower = abs(lower)  # because filter range is designed for positive values
+    Filter.set_lim(upper=upper, lower=lower)
+
+    # all assays and normalisers are processed independently so we filter them all
+    # together (by default in a single batch, otherwise concurrently) and split them again afterwards
+    if filtering.filter_mode == "batch" and filtering.batchable(Filter):
+        all_assays = filtering.pipe(Filter, assays + normalisers)
+    else:
+        all_assays = pipe_Filter(Filter, assays + normalisers, workers=workers, profiler=profiler)
+    assays, normalisers = all_assays[: len(assays)], all_assays[len(assays) :]
+
+    return (assays, normalisers), Filter
+
+
+def calibrate_stage(filtered, calibrate, efficiency_file, dilution, remove_calibrators, ignore_uncalibratable, stored=None, workers=None, profiler=None):
+    """
+    Calibrates the filtered assays and normalisers.
+    Any stored efficiencies (from the efficiency store) are assigned to assays without calibrator
+    replicates (assays with a dilution series are always calibrated anew), unless the reference file provides them.
+
+    Returns
+    -------
+    assays : tuple
+        The calibrated assays and normalisers (lists of qpcr.Assays).
+    calibrator : qpcr.Calibrator
+        The Calibrator used (or None if no calibration was performed).
+    from_store : dict
+        The stored efficiencies that were assigned (as `assay id : efficiency`).
+    """
+    (assays, normalisers), _ = filtered
+    if not calibrate:
+        return (assays, normalisers), None, {}
+
+    calibrator = qpcr.Calibrator()
+
+    # check if we have a reference file to work with
+    if efficiency_file is not None:
+        calibrator.load(efficiency_file)
+
+    # the reference file takes precedence over the efficiency store, and
+    # fresh dilution series take precedence over stored efficiencies
+    from_store = {}
+    if stored:
+        for assay in assays + normalisers:
+            if assay.id() in stored and assay.id() not in calibrator._eff_dict and not calibration.has_calibrators(calibrator, assay):
+                from_store[assay.id()] = stored[assay.id()]
+        calibrator.adopt({**from_store, **calibrator._eff_dict})
+
+    # get dilution settings if they should not be inferred.
+    if dilution is not None:
+        calibrator.dilution(dilution)
+
+    # calibration only sets the efficiency and drops calibrator
+    # replicates (which replaces the data), so no column needs copying
+    all_assays = snapshot.views(assays + normalisers)
+    # (by default the regressions of all dilution series are computed at once)
+    if calibration.calibration_mode == "batch":
+        all_assays = calibration.pipe(calibrator, all_assays, remove_calibrators=remove_calibrators, ignore_uncalibrated=ignore_uncalibratable)
+    else:
+        all_assays = pipe_Calibrator(calibrator, all_assays, workers=workers, profiler=profiler, remove_calibrators=remove_calibrators, ignore_uncalibrated=ignore_uncalibratable)
+    assays, normalisers = all_assays[: len(assays)], all_assays[len(assays) :]
+
+    return (assays, normalisers), calibrator, from_store
+
+
+def analyse_stage(calibrated, anchor, ref_group, workers=None, profiler=None):
+    """
+    Computes Delta-Ct values of the calibrated assays and normalisers.
+
+    Returns
+    -------
+    assays : list
+        The analysed assays.
+    normalisers : list
+        The analysed normalisers.
+    """
+    (assays, normalisers), _, _ = calibrated
 
     # setup the Analyser
     analyser = qpcr.Analyser()
-    analyser.anchor(session("anchor"), group=session("ref_group"))
+    analyser.anchor(anchor, group=ref_group)
 
-    # setup the Normaliser
-    normaliser = qpcr.Normaliser()
-    norm_mode = session("normalisation_mode")
+    # the Analyser only adds a new dCt column
+    all_assays = snapshot.views(assays + normalisers)
+    try:
+        all_assays, _ = parallel.pipe(analyser, all_assays, clone=_clone_Analyser, workers=workers, profiler=profiler, stage="analyse")
+    except IndexError:
+        raise stages.StageError("It seems like at least one assay is empty! If you only wish to perform calibration, make sure not to remove calibrator samples!")
 
-    # setup kwargs for additional parameters for permutative normalisation
-    norm_kwargs = {}
-    if norm_mode:
-        norm_kwargs = dict(k=session("permutate_stack"), replace=session("permutate_replace"))
+    assays, normalisers = all_assays[: len(assays)], all_assays[len(assays) :]
+    return assays, normalisers
 
-    # run main computation
-    with st.spinner("Running analysis..."):
 
-        if filter_type is not None:
-            assays = [Filter.pipe(i) for i in assays]
-            normalisers = [Filter.pipe(i) for i in normalisers]
+def normalise_stage(analysed, norm_mode, k, replace, seed=None):
+    """
+    Normalises the analysed assays against the normalisers.
+
+    Returns
+    -------
+    results : qpcr.Results
+        The Delta-Delta-Ct results.
+    assays : list
+        The normalised assays.
+    """
+    assays, normalisers = analysed
 
-        if calibrate:
-            assays = [calibrator.pipe(i, remove_calibrators=remove_calibrators, ignore_uncalibrated=ignore_uncalibratable) for i in assays]
-            normalisers = [calibrator.pipe(i, remove_calibrators=remove_calibrators, ignore_uncalibrated=ignore_uncalibratable) for i in normalisers]
+    # the Normaliser only adds new columns to the assays
+    # (or replaces their data when stacking / tiling)
+    assays = snapshot.views(assays)
+    normalisers = snapshot.views(normalisers)
 
-        try:
-            assays = [analyser.pipe(i) for i in assays]
-            normalisers = [analyser.pipe(i) for i in normalisers]
-        except IndexError:
-            st.error("It seems like at least one assay is empty! If you only wish to perform calibration, make sure not to remove calibrator samples!")
-            st.stop()
+    # setup kwargs for additional parameters for permutative normalisation
+    norm_kwargs = {}
+    if norm_mode:
+        norm_kwargs = dict(k=k, replace=replace)
 
-        normaliser.link(assays=assays, normalisers=normalisers)
-        normaliser.normalise(mode=norm_mode, **norm_kwargs)
+    # permutative normalisation is computed by the vectorised engine
+    normaliser = permutation.PermutativeNormaliser(seed=seed)
+    normaliser.link(assays=assays, normalisers=normalisers)
+    normaliser.normalise(mode=norm_mode, **norm_kwargs)
 
-        # get the results
-        results = normaliser.get()
+    # get the results
+    results = normaliser.get()
+    return results, assays
 
-        drop_rel = session("drop_rel")
-        if drop_rel:
-            results.drop_rel()
 
-    # now check if we should perform statistics
-    if session("perform_stats_tests"):
-        perform_statistical_tests(results)
+def finalise_stage(normalised, drop_rel):
+    """
+    Prepares the Delta-Delta-Ct results for presentation.
 
-    # add the Filter to allow
-    # downloading the Filter report
-    if filter_type is not None:
-        session("Filter", Filter)
+    Returns
+    -------
+    results : qpcr.Results
+        The final results (with their summary statistics computed).
+    """
+    results, _ = normalised
+    results = snapshot.view(results)
+
+    if drop_rel:
+        results.drop_rel()
 
     # remove the "assay" column as it is
     # meaninglsess in the _df setting
     if "assay" in results.get().columns:
         results.drop_cols("assay")
 
-    session("results", results)
-    results_df = results.get()
-    session("results_df", results_df)
-    results_stats = results.stats()
-    session("results_stats", results_stats)
-    figures = [Filter.plot()] if filter_type is not None else []
-    session("figures", figures)
+    results.stats()
+    return results
 
-    # and also store the assay copies that
-    # now contain the computed results
-    # We primarily do this to allow repeated analyses without affecting the
-    # already loaded raw data...
-    session("assays_computed", assays)
 
+def statistics_stage(results, perform, test_mode, comparison, pairs):
+    """
+    Performs statistical tests on the final results.
+
+    Returns
+    -------
+    results : qpcr.Results
+        The results (with the comparisons added if any tests were performed).
+    test_results
+        The test results (or None if no tests were performed).
+    """
+    if not perform:
+        return results, None
+
+    # the tests only add their comparisons to the results
+    results = snapshot.view(results)
+    test_results = perform_statistical_tests(results, test_mode, comparison, pairs)
+    return results, test_results
+
+
+def figures_stage(filtered, chart_mode):
+    """
+    Generates the figures of the analysis (the Filter summary).
+
+    The Filter summary is drawn by a copy of the Filter in the given plotting mode
+    (from the data the Filter collected), so the filtered output is left unchanged.
+
+    Returns
+    -------
+    figures : list
+        A list of figures.
+    """
+    _, Filter = filtered
+    if Filter is None:
+        return []
+
+    summary = copy(Filter)
+    summary.plotmode(chart_mode)
+    summary.plot_params(show=False)
+    summary._BoxPlotter._before = Filter._BoxPlotter._before
+    summary._BoxPlotter._after = Filter._BoxPlotter._after
+
+    figures = [summary.plot()]
+    return figures
+
+
+def pipe_Filter(Filter, assays, workers=None, profiler=None):
+    """
+    Runs a Filter on a list of assays concurrently.
+
+    Each assay is filtered by its own copy of the Filter and the filtering stats 
+    of all copies are collected back into the Filter. The Filter's summary plot 
+    is fed by the Filter itself (in assay order) before and after filtering.
+
+    Returns
+    -------
+    assays : list
+        The filtered assays.
+    """
+    Filter._BoxPlotter.add_before(assays)
+
+    assays, clones = parallel.pipe(Filter, assays, clone=_clone_Filter, workers=workers, profiler=profiler, stage="filter")
+
+    stats = [Filter._filter_stats] + [i._filter_stats for i in clones]
+    Filter._filter_stats = pd.concat(stats, ignore_index=True)
+
+    Filter._BoxPlotter.add_after(assays)
+    return assays
+
+
+def pipe_Calibrator(calibrator, assays, workers=None, profiler=None, **kwargs):
+    """
+    Runs a Calibrator on a list of assays concurrently.
+
+    Each assay is calibrated by its own copy of the Calibrator and the newly
+    computed efficiencies of all copies are collected back into the Calibrator.
+
+    Returns
+    -------
+    assays : list
+        The calibrated assays.
+    """
+    assays, clones = parallel.pipe(calibrator, assays, clone=_clone_Calibrator, workers=workers, profiler=profiler, stage="calibrate", **kwargs)
+
+    for clone in clones:
+        calibrator._eff_dict.update(clone._eff_dict)
+        calibrator._computed_values.update(clone._computed_values)
+
+    return assays
+
+
+class _NoPlotter:
+    """
+    Stands in for the summary plotter of Filter copies
+    (the original Filter collects the summary data itself).
+    """
+
+    def add_before(self, assay):
+        pass
+
+    def add_after(self, assay):
+        pass
 
+
+def _clone_Filter(Filter):
+    """
+    Copies a Filter with its own (empty) filtering stats and without a summary plotter.
+    """
+    clone = copy(Filter)
+    clone._filter_stats = Filter._filter_stats.iloc[:0]
+    clone._BoxPlotter = _NoPlotter()
+    return clone
+
+
+def _clone_Analyser(analyser):
+    """
+    Copies an Analyser with its own linked Assay. The Analyser's DeltaCt function is
+    usually one of its own methods, which has to be bound to the copy (rather than the original).
+    """
+    clone = copy(analyser)
+    clone._Assay = None
+
+    function = analyser._deltaCt_function
+    if getattr(function, "__self__", None) is analyser:
+        clone._deltaCt_function = getattr(clone, function.__name__)
+    return clone
+
+
+def _clone_Calibrator(calibrator):
+    """
+    Copies a Calibrator with its own efficiency records.
+    """
+    clone = copy(calibrator)
+    clone._eff_dict = dict(calibrator._eff_dict)
+    clone._computed_values = {}
+    return clone
+
+
+@profiled("filter figure")
 def show_filter_fig(container):
     """
     Generates a new expander for the pre- and post- filtering summary boxplots
@@ -235,27 +775,20 @@ def show_filter_fig(container):
         ctrl.add_figure(filter_fig, filter_fig_expander, chart_mode)
 
 
+@profiled("preview figure")
 def make_preview(container):
     """
     Generates a PreviewResults figure and stores it to a new expander
     """
 
-    # get a deepcopy of the results first, because we want to be able
-    # to exlude groups etc. for visualisation but not for the actual data
-    results = deepcopy(session("results"))
-
     # setup layout container
     preview_expander = container.expander("Preview Results", expanded=True)
     type_col, fig_col = preview_expander.columns((1, 9))
     show_violins = ctrl.setup_figure_type(type_col)
     ctrl.setup_subplot_type(type_col)
 
-    # ignore groups that were selected for ignoring
-    ignore_groups = session("ignore_groups")
-    if ignore_groups != []:
-        results.drop_groups(ignore_groups)
-
     # get plotter setup from the session
+    ignore_groups = session("ignore_groups")
     figure_type = session("figure_type")
     subplot_type = session("subplot_type")
     chart_mode = session("chart_mode")
@@ -273,8 +806,57 @@ def make_preview(container):
     plotting_kwargs = dict(kwargs, **plotting_kwargs)
     plotting_kwargs["show"] = False
 
-    # plot
-    preview_fig = results.preview(mode=chart_mode, kind=plotter, **plotting_kwargs)
+    def get_view(assays=None):
+        # get a view of the results first, because we want to be able
+        # to exlude groups etc. for visualisation but not for the actual data
+        # (dropping groups replaces the view's data, so no column needs copying)
+        if assays is None:
+            results = snapshot.view(session("results"))
+        else:
+            results = summaries.subset(session("results"), assays)
+
+        # ignore groups that were selected for ignoring
+        if ignore_groups != []:
+            results.drop_groups(ignore_groups)
+        return results
+
+    def render(assays=None):
+        results = get_view(assays)
+        return results.preview(mode=chart_mode, kind=plotter, **plotting_kwargs)
+
+    def render_summary():
+        summary = summaries.summarise(get_view())
+        return summaries.summary_figure(summary, subplot_type=subplot_type, figure_type=figure_type)
+
+    settings = dict(
+        figure_type=figure_type,
+        subplot_type=subplot_type,
+        chart_mode=chart_mode,
+        plotting_kwargs=plotting_kwargs,
+        ignore_groups=ignore_groups,
+    )
+    # (the results carry the comparisons of the statistical tests, which the figure may show)
+    versions = session("result_versions") or {}
+    version = (versions["results"], versions.get("tests")) if "results" in versions else None
+
+    # interactive figures of too many datapoints are too large for the browser,
+    # so these only show the summaries of the replicate groups
+    results = session("results")
+    if chart_mode == "interactive" and summaries.is_large(results):
+
+        preview_fig = cached_figure("preview summary", version, render_summary, **settings)
+        fig_col.info(f"The results have more than {summaries.point_threshold} datapoints, so only the summaries of the replicate groups are shown. Select an assay to view all of its replicates.")
+        ctrl.add_figure(preview_fig, fig_col, chart_mode)
+
+        # the full resolution is still available for single assays
+        assay = fig_col.selectbox("Show all Replicates of", [None] + results.data_cols, format_func=lambda x: "-" if x is None else x)
+        if assay is not None:
+            assay_fig = cached_figure("preview assay", version, lambda: render([assay]), assay=assay, **settings)
+            ctrl.add_figure(assay_fig, fig_col, chart_mode)
+        return
+
+    # plot (or reuse the figure of the same results and settings)
+    preview_fig = cached_figure("preview", version, render, **settings)
 
     # and add figure
     ctrl.add_figure(preview_fig, fig_col, chart_mode)
@@ -289,32 +871,41 @@ def stats_results_table(container):
         "View Summary Table",
         # help = "Show the summary statistics table of the delta-delta-Ct results that includes mean, stdv, and median of each group of each assay."
     )
-    stats_expander.table(session("results_stats"))
+    ctrl.paged_table(stats_expander, session("results_stats"), key="results_stats")
 
 
+@profiled("replicates figure")
 def show_ReplicateBoxPlot(container):
     """
     Generates a replicate boxplot and places it in an expander.
     """
-    # get the assays
-    assays = deepcopy(session("assays"))
-    normalisers = deepcopy(session("normalisers"))
-    assays = assays + normalisers
-
-    # setup the plotter
     mode = session("chart_mode")
-    plotter = qpcr.Plotters.ReplicateBoxPlot(mode=mode)
 
-    # link the assays
-    for a in assays:
-        plotter.link(a)
+    def render():
+        # get the assays (the plotter copies the data it links,
+        # so we can pass the raw assays directly)
+        assays = session("assays") + session("normalisers")
+
+        # setup the plotter
+        plotter = qpcr.Plotters.ReplicateBoxPlot(mode=mode)
+
+        # link the assays
+        for a in assays:
+            plotter.link(a)
+
+        return plotter.plot(show=False)
+
+    # the figure only shows the raw data, so it is reused until new data are read
+    store = session("raw_store")
+    version = (id(store), store.version()) if store is not None else None
 
     # plot and show
-    fig = plotter.plot(show=False)
+    fig = cached_figure("replicates", version, render, chart_mode=mode)
     expander = container.expander("Overview of Replicates")
     ctrl.add_figure(fig, expander, mode)
 
 
+@profiled("calibration figure")
 def show_calibration_fig(container):
     """
     Generates a calibration summarising figure for newly computed efficiencies.
@@ -328,7 +919,7 @@ def show_calibration_fig(container):
 
     # now check if we have any newly computed efficiencies at all or otherwise
     # just yield an info
-    if calibrator.computed_values() == {}:
+    if calibrator._computed_values == {}:
         calibration_expander.info("All efficiencies were assigned from references. Hence, there are no computations to visualise here...")
     else:
         # generate a plotter and link the calibrator
@@ -338,21 +929,55 @@ def show_calibration_fig(container):
         add_figure(fig, calibration_expander, mode=chart_mode)
 
 
-# a mapping of stats test functions from qpcr
+def show_stored_efficiencies(container):
+    """
+    Lists the efficiencies that were assigned from the efficiency store (if any).
+    """
+    from_store = session("stored_efficiencies")
+    if not from_store:
+        return
+
+    expander = container.expander(f"Stored Efficiencies ({len(from_store)})", expanded=False)
+    expander.info(
+        f"The efficiencies of these assays were not computed in this analysis but taken from the efficiency store at `{efficiencies.store_path}` (they have no calibrator replicates of their own)."
+    )
+    df = pd.DataFrame({"assay": list(from_store.keys()), "efficiency": list(from_store.values())})
+    expander.table(df)
+
+
+# a mapping of stats test functions (the batched
+# equivalents of the qpcr.stats functions)
 test_mapping = {  # func, arg of pairs
-    (True, True): (qstats.assaywise_ttests, "groups"),
-    (True, False): (qstats.groupwise_ttests, "columns"),
-    (False, True): (qstats.assaywise_anova, None),
-    (False, False): (qstats.groupwise_anova, None),
+    (True, True): (batchstats.assaywise_ttests, "groups"),
+    (True, False): (batchstats.groupwise_ttests, "columns"),
+    (False, True): (batchstats.assaywise_anova, None),
+    (False, False): (batchstats.groupwise_anova, None),
 }
 
 
-def perform_statistical_tests(results):
-
+def perform_statistical_tests(results, test_mode, comparison, pairs):
+    """
+    Performs statistical tests on the results.
+
+    Parameters
+    ----------
+    results : qpcr.Results
+        The results to test (the comparisons will be added to it).
+    test_mode : str
+        Either `"T-tests"` or `"ANOVA"`.
+    comparison : str
+        Either `"Groups in Assays"` or `"Assays in Groups"`.
+    pairs : list
+        The pairs to compare (for t-tests).
+
+    Returns
+    -------
+    test_results
+        The test results.
+    """
     # get the statistical tests
-    t_test = session("test_mode") == "T-tests"
-    assaywise = session("comparison") == "Groups in Assays"
-    pairs = session("selected_pairs")
+    t_test = test_mode == "T-tests"
+    assaywise = comparison == "Groups in Assays"
     if pairs == []:
         pairs = None
 
@@ -364,9 +989,37 @@ def perform_statistical_tests(results):
 
     # perform the test
     test_results = test_func(results, **test_kwargs)
+    return test_results
+
+
+def show_performance(container):
+    """
+    Generates a new expander with the time (and memory) spent on each
+    stage of the latest runs of the workflows (if any were recorded).
+    """
+    profiler = get_profiler()
+    if not profiler:
+        return
+
+    expander = container.expander("Performance", expanded=False)
+    expander.markdown("The time spent on each stage of the latest reading, analysis, and plotting. Stages that did not need to be re-computed for the latest analysis show their previous times.")
+
+    trace_memory = expander.checkbox(
+        "Record memory",
+        value=profiler.memory,
+        help="Record the memory allocated in each stage (from the next run on). Note, this slows down the analysis considerably.",
+    )
+    session("profile_memory", trace_memory)
+
+    columns = {"stage": "Stage", "assay": "Assay", "wall": "Time [s]", "cpu": "CPU time [s]", "memory": "Allocated memory [MB]"}
+
+    stages_df = profiler.to_df(assays=False).rename(columns=columns)
+    expander.table(stages_df)
 
-    # store the results
-    session("test_results", test_results)
+    assays_df = profiler.to_df().dropna(subset=["assay"]).rename(columns=columns)
+    if len(assays_df) > 0:
+        expander.markdown("Time spent on each single assay")
+        expander.dataframe(assays_df)
 
 
 def show_anova_table(container):
@@ -381,7 +1034,7 @@ def show_anova_table(container):
         return
 
     expander = container.expander("ANOVA Table")
-    expander.table(test_results.to_df())
+    ctrl.paged_table(expander, test_results.to_df(), key="anova_table")
 
 
 def show_ttest_table(container):
@@ -392,4 +1045,4 @@ def show_ttest_table(container):
         return
 
     expander = container.expander("T-Tests Table")
-    expander.table(test_results.to_df())
+    ctrl.paged_table(expander, test_results.to_df(), key="ttest_table")
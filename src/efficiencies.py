@@ -0,0 +1,136 @@
+"""
+This module defines the EfficiencyStore, a local on-disk store of qPCR primer efficiencies
+that persists across sessions.
+
+Efficiencies are stored by assay id and primer set (an optional label of the primers that were used
+for an assay, so different primer sets of the same assay can be kept apart). Efficiencies that were
+computed from dilution series during calibration are written back to the store, and in later sessions stored
+efficiencies are assigned to assays that have no calibrator replicates of their own (assays with a dilution series
+are always calibrated anew), so the dilution series of an assay do not have to be measured in every experiment.
+
+The store is shared by all sessions of a Qupid server, so it is only used if a session opts in.
+
+Note
+----
+The store is an SQLite database located at `~/.qupid/efficiencies.sqlite` by default.
+A different location can be set through the QUPID_EFFICIENCY_STORE environment variable
+(setting it to an empty string disables the store).
+"""
+
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime
+
+store_path = os.environ.get("QUPID_EFFICIENCY_STORE", os.path.join("~", ".qupid", "efficiencies.sqlite"))
+
+
+class EfficiencyStore:
+    """
+    A persistent store of qPCR primer efficiencies.
+
+    Parameters
+    ----------
+    path : str
+        The path to the SQLite database (default is `store_path`).
+        The database is created if it does not exist yet.
+    """
+
+    def __init__(self, path=None):
+        path = store_path if path is None else path
+        self.path = os.path.expanduser(path)
+
+    def load(self, assays=None, primers=""):
+        """
+        Loads stored efficiencies.
+
+        Parameters
+        ----------
+        assays : list
+            The assay ids to load. By default all stored efficiencies are loaded.
+        primers : str
+            The primer set of the efficiencies.
+
+        Returns
+        -------
+        efficiencies : dict
+            The stored efficiencies as `assay id : efficiency`.
+        """
+        with closing(self._connect()) as connection:
+            rows = connection.execute("SELECT assay, efficiency FROM efficiencies WHERE primers = ?", (primers,)).fetchall()
+
+        efficiencies = dict(rows)
+        if assays is not None:
+            efficiencies = {i: efficiencies[i] for i in assays if i in efficiencies}
+        return efficiencies
+
+    def save(self, efficiencies, primers=""):
+        """
+        Stores efficiencies (replacing any stored efficiencies of the same assays and primer set).
+
+        Parameters
+        ----------
+        efficiencies : dict
+            The efficiencies as `assay id : efficiency`.
+        primers : str
+            The primer set of the efficiencies.
+        """
+        if not efficiencies:
+            return
+
+        updated = datetime.now().isoformat(timespec="seconds")
+        rows = [(assay, primers, float(efficiency), updated) for assay, efficiency in efficiencies.items()]
+        with closing(self._connect()) as connection:
+            with connection:
+                connection.executemany("INSERT OR REPLACE INTO efficiencies (assay, primers, efficiency, updated) VALUES (?, ?, ?, ?)", rows)
+
+    def remove(self, assays, primers=""):
+        """
+        Removes the stored efficiencies of some assays.
+
+        Parameters
+        ----------
+        assays : list
+            The assay ids to remove.
+        primers : str
+            The primer set of the efficiencies.
+        """
+        with closing(self._connect()) as connection:
+            with connection:
+                connection.executemany("DELETE FROM efficiencies WHERE assay = ? AND primers = ?", [(i, primers) for i in assays])
+
+    def __len__(self):
+        with closing(self._connect()) as connection:
+            return connection.execute("SELECT COUNT(*) FROM efficiencies").fetchone()[0]
+
+    def _connect(self):
+        """
+        Opens a connection to the database (and sets it up if necessary).
+        """
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.execute(
+            """CREATE TABLE IF NOT EXISTS efficiencies (
+                assay TEXT NOT NULL,
+                primers TEXT NOT NULL DEFAULT '',
+                efficiency REAL NOT NULL,
+                updated TEXT,
+                PRIMARY KEY (assay, primers)
+            )"""
+        )
+        return connection
+
+
+def get_store():
+    """
+    Returns
+    -------
+    store : EfficiencyStore
+        The efficiency store at `store_path` (or None if the store is disabled).
+    """
+    if not store_path:
+        return None
+    return EfficiencyStore()
@@ -0,0 +1,215 @@
+"""
+This module assembles the files that Qupid offers for download.
+
+The files are written in a single pass into an in-memory buffer (optionally as a gzip stream),
+rather than being assembled from strings, so a file is never held in memory more than once.
+
+Tables can be downloaded either as `csv` or in the binary columnar `parquet` and `feather` (Arrow) formats,
+which retain the column dtypes and are considerably faster to load. In the binary formats all assays and normalisers
+are stored as one table with an `assay` and a decorator (`@qpcr`) column, and any additional metadata
+(e.g. the input datafiles) is stored in the file's schema metadata under the key `qupid`.
+"""
+
+import gzip
+import io
+import json
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+import qpcr
+
+# the available download formats and their mime types
+formats = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "feather": "application/vnd.apache.arrow.file",
+}
+
+
+def write_all_assays(stream, assays, normalisers, input_files, timestamp=None):
+    """
+    Writes all assays and normalisers into a single (irregular csv) file,
+    where each assay is decorated as either assay or normaliser.
+
+    Parameters
+    ----------
+    stream : io.TextIOBase
+        The text stream to write to.
+    assays : list
+        A list of qpcr.Assay objects.
+    normalisers : list
+        A list of qpcr.Assay objects of normaliser assays.
+    input_files : list
+        The names of the input datafiles.
+    timestamp : datetime
+        The date and time to note in the header (default is now).
+    """
+    timestamp = datetime.now() if timestamp is None else timestamp
+
+    # write the header
+    stream.write(f"Qupid Analysed Assays\nDate,{timestamp.strftime('%Y-%m-%d')}\nTime,{timestamp.strftime('%H:%M:%S')}\n")
+    input_files = "\n".join(input_files)
+    stream.write(f"\nInput Datafile(s):\n{input_files}\n\n")
+
+    # now write the assays and normalisers with their decorators
+    for key, group in (("qpcr:assay", assays), ("qpcr:normaliser", normalisers)):
+        decorator = qpcr.Parsers.plain_decorators[key]
+        for assay in group:
+            stream.write(f"{decorator}\n{assay.id()}\n")
+            assay.get().to_csv(stream, index=False)
+            stream.write("\n\n")
+
+
+def all_assays_file(assays, normalisers, input_files, compress=False):
+    """
+    Assembles the single (irregular csv) file of all assays and normalisers (see `write_all_assays`).
+
+    Parameters
+    ----------
+    compress : bool
+        Compress the file using gzip.
+
+    Returns
+    -------
+    data : bytes
+        The file contents.
+    """
+    return to_bytes(write_all_assays, assays, normalisers, input_files, compress=compress)
+
+
+def all_assays_table(assays, normalisers):
+    """
+    Assembles all assays and normalisers into a single table.
+
+    Parameters
+    ----------
+    assays : list
+        A list of qpcr.Assay objects.
+    normalisers : list
+        A list of qpcr.Assay objects of normaliser assays.
+
+    Returns
+    -------
+    df : pd.DataFrame
+        The data of all assays, with the assay id in an `assay` column
+        and its decorator (`assay` or `normaliser`) in an `@qpcr` column.
+    """
+    column = qpcr.Parsers.plain_decorators["qpcr:column"]
+
+    dfs = []
+    for decorator, group in (("assay", assays), ("normaliser", normalisers)):
+        for assay in group:
+            df = assay.get()
+            df = df.assign(assay=assay.id(), **{column: decorator})
+            dfs.append(df)
+
+    if len(dfs) == 0:
+        return pd.DataFrame(columns=["assay", column])
+
+    df = pd.concat(dfs, ignore_index=True)
+
+    # move the assay and decorator columns to the front
+    first = ["assay", column]
+    df = df[first + [i for i in df.columns if i not in first]]
+    return df
+
+
+def all_assays_metadata(input_files, timestamp=None):
+    """
+    Returns
+    -------
+    metadata : dict
+        The metadata of a binary all assays table (the input datafiles,
+        the date and time, and the decorators used in the `@qpcr` column).
+    """
+    timestamp = datetime.now() if timestamp is None else timestamp
+    decorators = {key: qpcr.Parsers.plain_decorators[f"qpcr:{key}"] for key in ("assay", "normaliser")}
+    return dict(input_files=list(input_files), date=timestamp.strftime("%Y-%m-%d"), time=timestamp.strftime("%H:%M:%S"), decorators=decorators)
+
+
+def table_file(df, fmt="csv", metadata=None):
+    """
+    Converts a table into the contents of a download file.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The table.
+    fmt : str
+        The file format (any of `formats`).
+    metadata : dict
+        Any metadata to store with the table (only for the binary formats).
+
+    Returns
+    -------
+    data : str or bytes
+        The file contents (a string for `csv` files, bytes otherwise).
+    """
+    if fmt == "csv":
+        return df.to_csv(index=False)
+
+    table = _to_arrow(df)
+    if metadata is not None:
+        schema_metadata = dict(table.schema.metadata or {})
+        schema_metadata[b"qupid"] = json.dumps(metadata).encode("utf-8")
+        table = table.replace_schema_metadata(schema_metadata)
+
+    buffer = pa.BufferOutputStream()
+    if fmt == "parquet":
+        pq.write_table(table, buffer)
+    elif fmt == "feather":
+        feather.write_feather(table, buffer)
+    else:
+        raise ValueError(f"Unknown format '{fmt}'. Use any of {list(formats)}.")
+    return buffer.getvalue().to_pybytes()
+
+
+def to_bytes(writer, *args, compress=False, **kwargs):
+    """
+    Runs a writer function on an in-memory text stream and returns the written bytes.
+
+    Parameters
+    ----------
+    writer : callable
+        A function that writes to a text stream (which is passed as its first argument).
+    *args, **kwargs
+        Any additional arguments for the writer.
+    compress : bool
+        Compress the written data using gzip.
+
+    Returns
+    -------
+    data : bytes
+        The written (utf-8 encoded) data.
+    """
+    buffer = io.BytesIO()
+    raw = gzip.GzipFile(fileobj=buffer, mode="wb", mtime=0) if compress else buffer
+
+    # newlines are written as they are (the csv writer uses its own line terminators)
+    stream = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+    writer(stream, *args, **kwargs)
+    stream.flush()
+    stream.detach()
+
+    if compress:
+        raw.close()
+    return buffer.getvalue()
+
+
+def _to_arrow(df):
+    """
+    Converts a DataFrame into an Arrow table. Any columns of mixed types
+    (e.g. tuples of group names) are stored as strings.
+    """
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        df = df.copy()
+        for col in df.columns:
+            if df[col].dtype == object:
+                df[col] = df[col].astype(str)
+        df.columns = [str(i) for i in df.columns]
+        return pa.Table.from_pandas(df, preserve_index=False)
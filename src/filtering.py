@@ -0,0 +1,140 @@
+"""
+This module defines a batched filtering of qPCR assays.
+
+The qpcr Filters (`RangeFilter` and `IQRFilter`) filter one assay at a time and compute the median
+(and quartiles) of each group of replicates separately. Here, the Ct values of all assays are first combined
+into one long table (with the assay and group of each replicate), from which the medians, quartiles and
+inclusion ranges of all groups of all assays are computed in a single grouped pass. The outliers are then
+removed from each assay just like the Filter would, and the filtering stats and summary plot of the Filter
+are filled just like before (so the Filter report remains available).
+
+The filtering mode can be set through the environment variable:
+
+QUPID_FILTERING             either `batch` (default) or `pipe` (filter one assay at a time using `qpcr.Filter.pipe`)
+
+Note
+----
+The batched filtering only supports the default anchors of the Filters (the group medians) and no report files.
+Any other Filters have to be piped as usual (see `batchable`).
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import qpcr
+import qpcr.defaults as defaults
+
+filter_mode = os.environ.get("QUPID_FILTERING", "batch")
+
+
+def batchable(Filter):
+    """
+    Checks if a Filter can be applied in batch.
+
+    Returns
+    -------
+    batchable : bool
+        True if the Filter is a RangeFilter (using the group medians as anchors) or an IQRFilter,
+        and does not write any report files.
+    """
+    if Filter._report_loc is not None:
+        return False
+    if isinstance(Filter, qpcr.Filters.RangeFilter):
+        return Filter._anchor is None
+    return isinstance(Filter, qpcr.Filters.IQRFilter)
+
+
+def pipe(Filter, assays):
+    """
+    Filters a list of assays (the batched equivalent of `qpcr.Filter.pipe`).
+
+    Parameters
+    ----------
+    Filter : qpcr.Filters.RangeFilter or qpcr.Filters.IQRFilter
+        The Filter. Its filtering stats and summary plot are updated.
+    assays : list
+        The qpcr.Assays to filter.
+
+    Returns
+    -------
+    assays : list
+        The filtered assays.
+    """
+    Filter._BoxPlotter.add_before(assays)
+
+    # combine the replicates of all assays into one long table
+    Ct = defaults.raw_col_names[1]
+    dfs = [assay.get() for assay in assays]
+    lengths = np.array([len(df) for df in dfs])
+    if lengths.sum() == 0:
+        Filter._BoxPlotter.add_after(assays)
+        return assays
+
+    replicates = pd.DataFrame(
+        {
+            "assay": np.repeat(np.arange(len(assays)), lengths),
+            "group": np.concatenate([df["group"].to_numpy() for df in dfs]),
+            Ct: np.concatenate([df[Ct].to_numpy(dtype=float) for df in dfs]),
+        }
+    )
+
+    # now get the inclusion ranges of all groups of all assays at once
+    # (groups are kept in the order of their appearance, just like `qpcr.Assay.groups`)
+    grouped = replicates.groupby(["assay", "group"], sort=False)
+    codes = grouped.ngroup().to_numpy()
+    stats = inclusion_ranges(Filter, grouped[Ct])
+
+    # replicates outside of the inclusion range of their group are outliers
+    # (groups with a missing anchor have missing bounds and thus no outliers)
+    cts = replicates[Ct].to_numpy()
+    outliers = (cts < stats["lower"].to_numpy()[codes]) | (cts > stats["upper"].to_numpy()[codes])
+
+    # and remove the outliers from each assay
+    offsets = np.cumsum(lengths)[:-1]
+    for assay, df, faulty in zip(assays, dfs, np.split(outliers, offsets)):
+        Filter.link(assay)
+        Filter._filter_out(list(df.index[faulty]))
+    Filter._Assay = None
+
+    # groups with a missing anchor are ignored (if so specified) and do not enter the stats
+    if Filter._ignore_nan:
+        stats = stats[stats["anchor"].notna()]
+    stats = stats.reset_index()
+    stats["assay"] = [assays[i].id() for i in stats["assay"]]
+    stats = stats[["assay", "group", "anchor", "upper", "lower"]]
+    Filter._filter_stats = pd.concat([Filter._filter_stats, stats], ignore_index=True)
+
+    Filter._BoxPlotter.add_after(assays)
+    return assays
+
+
+def inclusion_ranges(Filter, grouped):
+    """
+    Computes the anchors and inclusion ranges of groups of replicates (just like the Filters).
+
+    Parameters
+    ----------
+    Filter : qpcr.Filters.RangeFilter or qpcr.Filters.IQRFilter
+        The Filter (which defines the inclusion ranges).
+    grouped : pd.core.groupby.SeriesGroupBy
+        The Ct values grouped by assay and group.
+
+    Returns
+    -------
+    stats : pd.DataFrame
+        The `anchor`, `upper` and `lower` bounds of each group (indexed by assay and group).
+    """
+    anchor = grouped.median()
+
+    if isinstance(Filter, qpcr.Filters.IQRFilter):
+        # the IQRFilter uses the median and quartiles of the non-missing values
+        first, third = grouped.quantile(0.26), grouped.quantile(0.76)
+        iqr = third - first
+        upper, lower = anchor + iqr * Filter._upper, anchor - iqr * Filter._lower
+    else:
+        # the RangeFilter uses the median of all values (which is missing if any value is missing)
+        anchor = anchor.where(grouped.count() == grouped.size())
+        upper, lower = anchor + Filter._upper, anchor - Filter._lower
+
+    return pd.DataFrame({"anchor": anchor, "upper": upper, "lower": lower})
@@ -253,6 +253,11 @@ if session("assays") is not None and session("normalisers") is not None:
 
     analysis_was_run = True if session("analysis_was_run") is not None else False
 
+    # the statistical tests follow their settings without
+    # re-running the analysis (they are only recomputed if their settings changed)
+    if analysis_was_run:
+        core.run_statistics()
+
     # =================================================================
     # Present Results
     # =================================================================
@@ -275,6 +280,7 @@ if session("assays") is not None and session("normalisers") is not None:
         #  make a calibration overview figure for newly computed efficiencies
         if show_calibration:
             core.show_calibration_fig(results_container)
+        core.show_stored_efficiencies(results_container)
 
         # make a preview figure
         if run_plotting:
@@ -283,8 +289,10 @@ if session("assays") is not None and session("normalisers") is not None:
         core.show_anova_table(results_container)
         core.show_ttest_table(results_container)
         core.stats_results_table(results_container)
+        core.show_performance(results_container)
 
         # make some download buttons and stuff...
+        ctrl.setup_download_format(results_container)
         cols = ctrl.setup_download_button_column_number()
         download_buttons = results_container.columns(cols)
 
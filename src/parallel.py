@@ -0,0 +1,156 @@
+"""
+This module handles the concurrent execution of independent work items,
+such as the sheets of a multi-sheet file or the single assays of an analysis.
+
+At its core it defines `pmap`, an ordered map over a worker pool. Work can be
+executed in threads, in separate processes, or serially. The defaults can be
+set through the environment variables:
+
+QUPID_EXECUTOR              either `thread` (default), `process`, or `serial`
+QUPID_WORKERS               the maximum number of workers (default is the number of CPUs)
+
+Note
+----
+Workers do not have access to the streamlit session! Any settings
+from the session have to be read beforehand and passed to the workers.
+"""
+
+import os
+import pickle
+import time
+from copy import copy
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import profiling
+
+executor_modes = ("thread", "process", "serial")
+
+executor_mode = os.environ.get("QUPID_EXECUTOR", "thread")
+max_workers = int(os.environ.get("QUPID_WORKERS", os.cpu_count() or 1))
+
+
+def pmap(func, items, workers=None, mode=None):
+    """
+    Applies a function to each of a number of items concurrently.
+
+    Parameters
+    ----------
+    func : callable
+        The function to apply. For `process` mode this must be picklable
+        (i.e. a module-level function or a `functools.partial` thereof).
+    items : iterable
+        The items to apply the function to.
+    workers : int
+        The maximum number of workers. By default `max_workers` is used.
+    mode : str
+        The executor mode to use (either `thread`, `process`, or `serial`).
+        By default `executor_mode` is used.
+
+    Returns
+    -------
+    results : list
+        The results of each item in the same order as the items.
+    """
+    items = list(items)
+    workers = max_workers if workers is None else workers
+    mode = executor_mode if mode is None else mode
+
+    if mode not in executor_modes:
+        raise ValueError(f"Unknown executor mode '{mode}'. Use any of {executor_modes}.")
+
+    # there is no point in setting up a pool
+    # for a single worker or a single item
+    workers = min(workers, len(items))
+    if mode == "serial" or workers <= 1:
+        return [func(i) for i in items]
+
+    if mode == "thread":
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(func, items))
+
+    # work that cannot be pickled cannot be sent to other processes, so we run it serially
+    if not _picklable(func, items):
+        return [func(i) for i in items]
+
+    # the pool may still break down (e.g. a worker is killed), in which case we also run serially.
+    # Any errors raised by the work itself are passed on to the caller.
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(func, items))
+    except (BrokenProcessPool, pickle.PicklingError):
+        return [func(i) for i in items]
+
+
+def _picklable(func, items):
+    """
+    Checks if a function and its items can be pickled (and thus be sent to worker processes).
+    """
+    try:
+        pickle.dumps((func, items))
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return False
+    return True
+
+
+def pipe(tool, items, clone=copy, workers=None, mode=None, profiler=None, stage=None, **kwargs):
+    """
+    Runs the `pipe` method of a qpcr tool (e.g. a Filter, Calibrator, or Analyser)
+    on each of a number of items concurrently.
+
+    Each item is piped by its own clone of the tool, so the workers never share any state.
+    Any state the clones collected (e.g. computed efficiencies) has to be merged back by the caller.
+
+    Parameters
+    ----------
+    tool
+        An object with a `pipe` method.
+    items : list
+        The items (e.g. qpcr.Assays) to pipe.
+    clone : callable
+        A function that returns an independent clone of the tool (default is `copy.copy`).
+    workers : int
+        The maximum number of workers. By default `max_workers` is used.
+    mode : str
+        The executor mode to use. By default `executor_mode` is used.
+    profiler : profiling.Profiler
+        A Profiler to record the time spent on each item.
+    stage : str
+        The name of the stage to record the items under (if a profiler is given).
+    **kwargs
+        Any additional keyword arguments for the `pipe` method.
+
+    Returns
+    -------
+    items : list
+        The piped items in their original order.
+    clones : list
+        The clones of the tool that piped each item.
+    """
+    stage = None if profiler is None else stage
+    jobs = [(clone(tool), item, kwargs, stage) for item in items]
+    results = pmap(_pipe, jobs, workers=workers, mode=mode)
+
+    items = [item for item, _, _ in results]
+    clones = [tool for _, tool, _ in results]
+
+    # the records are measured by the workers
+    # (which may not share the profiler) so we add them here
+    for _, _, record in results:
+        if record is not None:
+            profiler.add(record)
+
+    return items, clones
+
+
+def _pipe(job):
+    """
+    Pipes a single item through its clone of a tool (and records it if a stage is given).
+    """
+    tool, item, kwargs, stage = job
+    if stage is None:
+        return tool.pipe(item, **kwargs), tool, None
+
+    with profiling.Record(stage, assay=item.id(), clock=time.thread_time) as record:
+        item = tool.pipe(item, **kwargs)
+    return item, tool, record
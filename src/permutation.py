@@ -0,0 +1,192 @@
+"""
+This module defines a vectorised engine for the permutative normalisation of assays.
+
+In permutative mode, the normaliser replicates of each group are scrambled randomly `k` times and the assay
+replicates are normalised pair-wise against each scrambled version, which generates `n * k` Delta-Delta-Ct values
+per group of `n` replicates. Rather than drawing and dividing one permutation at a time, all `k` permutations of a group
+are drawn at once as a `k x n` index matrix, so the Delta-Delta-Ct values of a group are computed in a single step.
+
+The `PermutativeNormaliser` is a drop-in replacement for the `qpcr.Normaliser` that uses this engine for
+the permutative mode (any other mode is handled by the `qpcr.Normaliser` itself). Its permutations are drawn
+from a seeded random number generator, so results are reproducible.
+"""
+
+import numpy as np
+import pandas as pd
+import qpcr
+import qpcr.defaults as defaults
+
+
+def permutations(size, k, rng):
+    """
+    Draws random permutations (without replacement).
+
+    Parameters
+    ----------
+    size : int
+        The number of entries to permute.
+    k : int
+        The number of permutations.
+    rng : np.random.Generator
+        The random number generator to use.
+
+    Returns
+    -------
+    indices : np.ndarray
+        A `k x size` matrix where each row holds the indices of one permutation.
+    """
+    return np.argsort(rng.random((k, size)), axis=1)
+
+
+def weighted_draws(values, k, rng):
+    """
+    Draws random samples (with replacement) of the entries of some values.
+
+    The entries are weighted by the probability density of a normal distribution
+    fitted to the values (so entries close to the mean are more likely to be drawn).
+
+    Parameters
+    ----------
+    values : np.ndarray
+        The values to draw from.
+    k : int
+        The number of samples.
+    rng : np.random.Generator
+        The random number generator to use.
+
+    Returns
+    -------
+    indices : np.ndarray
+        A `k x len(values)` matrix where each row holds the indices of one sample.
+    """
+    mu, sd = np.mean(values), np.std(values)
+
+    # (the normalisation constant of the density cancels out)
+    probs = np.exp(-0.5 * ((values - mu) / sd) ** 2) if sd > 0 else np.ones(len(values))
+    if not np.all(np.isfinite(probs)) or probs.sum() == 0:
+        probs = np.ones(len(values))
+    probs = probs / probs.sum()
+
+    return rng.choice(len(values), size=(k, len(values)), replace=True, p=probs)
+
+
+def permutative_ddCt(a_dCt, a_groups, n_dCt, n_groups, k, replace, rng):
+    """
+    Computes permutative Delta-Delta-Ct values of an assay against a normaliser.
+
+    Parameters
+    ----------
+    a_dCt : np.ndarray
+        The Delta-Ct values of the assay.
+    a_groups : np.ndarray
+        The group identifiers of the assay's replicates.
+    n_dCt : np.ndarray
+        The Delta-Ct values of the normaliser.
+    n_groups : np.ndarray
+        The group identifiers of the normaliser's replicates.
+    k : int
+        The number of permutations.
+    replace : bool
+        Draw the normaliser replicates with replacement (see `weighted_draws`).
+    rng : np.random.Generator
+        The random number generator to use.
+
+    Returns
+    -------
+    ddCt : np.ndarray
+        The Delta-Delta-Ct values, group-wise in the order of the stacked assay (see `stack_indices`).
+    """
+    ddCts = []
+    for group in pd.unique(a_groups):
+        a = a_dCt[a_groups == group]
+        n = n_dCt[n_groups == group]
+
+        if replace:
+            indices = weighted_draws(n, k, rng)
+        else:
+            indices = permutations(n.size, k, rng)
+
+        # each row is the assay normalised against one scrambled normaliser
+        ddCts.append((a / n[indices]).ravel())
+
+    return np.concatenate(ddCts) if ddCts else np.zeros(0)
+
+
+def stack_indices(groups, k):
+    """
+    Gets the row indices that stack each group of replicates `k` times.
+
+    Parameters
+    ----------
+    groups : np.ndarray
+        The group identifiers of the replicates.
+    k : int
+        The number of stacks.
+
+    Returns
+    -------
+    indices : np.ndarray
+        The row indices of the stacked replicates (group-wise, each group repeated `k` times).
+    """
+    indices = [np.tile(np.flatnonzero(groups == group), k) for group in pd.unique(groups)]
+    return np.concatenate(indices) if indices else np.zeros(0, dtype=int)
+
+
+class PermutativeNormaliser(qpcr.Normaliser):
+    """
+    A qpcr.Normaliser that performs permutative normalisation with a vectorised engine.
+
+    Parameters
+    ----------
+    seed : int
+        The seed for the random permutations (default is the `qpcr` default seed).
+    """
+
+    def __init__(self, seed=None):
+        super().__init__()
+        self._seed = defaults.seed if seed is None else seed
+
+    def normalise(self, mode="pair-wise", **kwargs):
+        """
+        Normalises all linked assays against the combined normaliser.
+
+        Parameters
+        ----------
+        mode : str
+            The normalisation mode to use (see `qpcr.Normaliser.normalise`).
+            Only the `permutative` mode is handled by the vectorised engine.
+        **kwargs
+            For the `permutative` mode, `k` (the number of permutations) and `replace`
+            (whether to allow replacement) can be specified.
+        """
+        if mode != "permutative" or self._norm_func_is_set:
+            return super().normalise(mode=mode, **kwargs)
+
+        if self._normaliser is None:
+            self._normaliser = self._prep_func(self._Normalisers, **kwargs)
+            self._vet_normaliser()
+
+        k = int(kwargs.get("k") or 1)
+        replace = bool(kwargs.get("replace"))
+        col = kwargs.get("col", "dCt")
+        rng = np.random.default_rng(self._seed)
+
+        normaliser = self._normaliser.get()
+        n_dCt, n_groups = normaliser[col].to_numpy(), normaliser["group"].to_numpy()
+
+        for assay in self._Assays:
+
+            df = assay.get()
+            a_dCt, a_groups = df[col].to_numpy(), df["group"].to_numpy()
+
+            ddCt = permutative_ddCt(a_dCt, a_groups, n_dCt, n_groups, k, replace, rng)
+
+            # stack the assay to match the Delta-Delta-Ct values
+            stacked = df.iloc[stack_indices(a_groups, k)].reset_index(drop=True)
+            assay.adopt(stacked)
+
+            if self._Results.is_empty:
+                self._Results.setup_cols(assay)
+
+            assay.add_ddCt(self._normaliser.id(), pd.Series(ddCt, name="ddCt"))
+            self._Results.add_ddCt(assay)
@@ -0,0 +1,213 @@
+"""
+This module handles the profiling of Qupid's workflows, to find out where the time of an analysis goes.
+
+A `Profiler` collects one `Record` for each stage of a workflow (e.g. reading, filtering, normalising or plotting),
+and optionally for each assay that was processed within a stage. Each record holds the wall time, the CPU time, and the
+memory that was allocated (and not released again) during the stage. The Profiler of a session only keeps the latest record
+of each stage (and assay), so it always reflects the latest run of each stage.
+
+Note
+----
+Tracing memory allocations slows down Python considerably, so memory is only recorded
+if the Profiler was set up to trace memory (default is set through the QUPID_PROFILE_MEMORY environment variable).
+Tracing is process-wide, so it is shared by all sessions: it is started by the first stage that profiles memory and only
+stopped once the last such stage (of any session) is done. Like the CPU times of whole stages, the recorded memory therefore
+also includes allocations of any other sessions running concurrently.
+CPU times of whole stages include any worker threads (and any other sessions running concurrently),
+CPU times of single assays only include the worker thread that processed the assay.
+"""
+
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import pandas as pd
+
+trace_memory = os.environ.get("QUPID_PROFILE_MEMORY", "0").lower() in ("1", "true", "yes")
+
+# the number of stages (of all sessions) that currently trace memory, and whether
+# tracing was started by them (rather than being enabled from outside, e.g. by a benchmark)
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+_tracing_started = False
+
+
+class Record:
+    """
+    Measures the wall time, CPU time, and allocated memory of a stage (or a single assay within a stage).
+
+    It is used as a context manager around the code to measure.
+
+    Parameters
+    ----------
+    stage : str
+        The name of the stage.
+    assay : str
+        The id of the assay (if the record refers to a single assay).
+    clock : callable
+        The CPU clock to use (default is `time.process_time`).
+    """
+
+    def __init__(self, stage, assay=None, clock=time.process_time):
+        self.stage = stage
+        self.assay = assay
+        self.wall = None
+        self.cpu = None
+        self.memory = None
+        self._clock = clock
+
+    def __enter__(self):
+        self._memory = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        self._cpu = self._clock()
+        self._wall = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.wall = time.perf_counter() - self._wall
+        self.cpu = self._clock() - self._cpu
+        if self._memory is not None and tracemalloc.is_tracing():
+            self.memory = (tracemalloc.get_traced_memory()[0] - self._memory) / 1024 ** 2
+        return False
+
+    def __getstate__(self):
+        # the clock is not needed anymore once measured (and may not be picklable)
+        state = dict(self.__dict__)
+        state.pop("_clock", None)
+        return state
+
+    def to_dict(self):
+        """
+        Returns
+        -------
+        record : dict
+            The stage, assay, wall time (s), CPU time (s), and allocated memory (MB).
+        """
+        return dict(stage=self.stage, assay=self.assay, wall=self.wall, cpu=self.cpu, memory=self.memory)
+
+
+class Profiler:
+    """
+    Collects the records of the stages of a session's workflows.
+
+    Parameters
+    ----------
+    memory : bool
+        Trace memory allocations (default is `trace_memory`).
+    """
+
+    def __init__(self, memory=None):
+        self._records = {}
+        self._lock = threading.Lock()
+        self.memory = trace_memory if memory is None else memory
+
+    @contextmanager
+    def profile(self, stage, assay=None):
+        """
+        Profiles the enclosed code as a stage (or a single assay within a stage).
+
+        Parameters
+        ----------
+        stage : str
+            The name of the stage.
+        assay : str
+            The id of the assay (if only a single assay is processed).
+        """
+        if self.memory:
+            _start_tracing()
+
+        clock = time.process_time if assay is None else time.thread_time
+        record = Record(stage, assay, clock=clock)
+        try:
+            with record:
+                yield record
+        finally:
+            if self.memory:
+                _stop_tracing()
+            self.add(record)
+
+    def add(self, record):
+        """
+        Adds a record (replacing any previous record of the same stage and assay).
+
+        Parameters
+        ----------
+        record : Record
+            The record to add.
+        """
+        with self._lock:
+            # re-insert to keep the records in the order of their latest run
+            self._records.pop((record.stage, record.assay), None)
+            self._records[(record.stage, record.assay)] = record
+
+    def clear(self):
+        """
+        Forgets all records.
+        """
+        with self._lock:
+            self._records = {}
+
+    def records(self, digits=None):
+        """
+        Parameters
+        ----------
+        digits : int
+            Round the measures to a number of digits.
+
+        Returns
+        -------
+        records : list
+            The records as dictionaries (see `Record.to_dict`).
+        """
+        with self._lock:
+            records = [i.to_dict() for i in self._records.values()]
+
+        if digits is not None:
+            records = [{key: round(value, digits) if isinstance(value, float) else value for key, value in i.items()} for i in records]
+        return records
+
+    def to_df(self, assays=True):
+        """
+        Parameters
+        ----------
+        assays : bool
+            Include the records of single assays.
+
+        Returns
+        -------
+        df : pd.DataFrame
+            A table of the records.
+        """
+        df = pd.DataFrame(self.records(), columns=["stage", "assay", "wall", "cpu", "memory"])
+        if not assays:
+            df = df[df["assay"].isna()].drop(columns="assay")
+        return df.reset_index(drop=True)
+
+    def __bool__(self):
+        return len(self._records) > 0
+
+
+def _start_tracing():
+    """
+    Starts tracing memory allocations (unless they are already traced) and registers another user of the tracing.
+    """
+    global _tracing_users, _tracing_started
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_started = True
+        _tracing_users += 1
+
+
+def _stop_tracing():
+    """
+    Unregisters a user of the tracing and stops tracing once there are no more users
+    (but only if the tracing was started by them).
+    """
+    global _tracing_users, _tracing_started
+    with _tracing_lock:
+        _tracing_users -= 1
+        if _tracing_users == 0 and _tracing_started:
+            tracemalloc.stop()
+            _tracing_started = False
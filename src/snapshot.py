@@ -0,0 +1,121 @@
+"""
+This module handles copy-on-write views of the qpcr objects (Assays and Results) that Qupid keeps in the session.
+
+The raw assays and normalisers that were read from the uploaded files are stored once in a `RawStore`.
+Every analysis then works on views of them instead of deepcopies. A view is a shallow copy
+of the object whose DataFrame shares all its column data with the original. New columns (e.g. `dCt`, or the
+`rel_{}` columns) are only ever added to the view, and columns that are going to be overwritten (e.g. the `Ct` column
+during filtering) are declared `writable` and get their own private copy. Hence, only the data that is actually
+modified is allocated anew.
+
+Note
+----
+pandas writes values of an existing column in place into the (shared) data block.
+Therefore, any column that is modified through `df[col] = ...` **must** be declared writable!
+Columns that are replaced through a new DataFrame (e.g. by dropping rows) need not be.
+"""
+
+from copy import copy
+
+
+def view(obj, writable=()):
+    """
+    Generates a copy-on-write view of a qpcr.Assay or qpcr.Results object.
+
+    Parameters
+    ----------
+    obj : qpcr.Assay or qpcr.Results
+        The object to view.
+    writable : iterable
+        The columns that will be modified in place and hence require their own copy.
+
+    Returns
+    -------
+    view : qpcr.Assay or qpcr.Results
+        A shallow copy of the object with its own DataFrame.
+    """
+    new = copy(obj)
+    df = obj._df.copy(deep=False)
+
+    # re-insert the writable columns as copies
+    # so that writing to them does not affect the original
+    for col in writable:
+        if col in df.columns:
+            loc = df.columns.get_loc(col)
+            values = df.pop(col).to_numpy(copy=True)
+            df.insert(loc, col, values)
+
+    new._df = df
+    return new
+
+
+def views(objs, writable=()):
+    """
+    Generates copy-on-write views of a list of qpcr.Assay or qpcr.Results objects.
+
+    Returns
+    -------
+    views : list
+        A list of views (see `view`).
+    """
+    return [view(i, writable=writable) for i in objs]
+
+
+class RawStore:
+    """
+    Stores the raw assays and normalisers that were read from the uploaded files.
+
+    The stored objects must never be modified. Any analysis should
+    work on views of them (see `assays` and `normalisers`). Each time new data is stored
+    the store's version is increased, which allows to identify the data any results were computed from.
+    """
+
+    def __init__(self):
+        self._assays = ()
+        self._normalisers = ()
+        self._version = 0
+
+    def set(self, assays, normalisers):
+        """
+        Stores new raw assays and normalisers.
+
+        Parameters
+        ----------
+        assays : list
+            A list of qpcr.Assay objects.
+        normalisers : list
+            A list of qpcr.Assay objects of normaliser assays.
+        """
+        self._assays = tuple(assays)
+        self._normalisers = tuple(normalisers)
+        self._version += 1
+
+    def assays(self, writable=()):
+        """
+        Returns
+        -------
+        assays : list
+            Copy-on-write views of the stored assays (see `view`).
+        """
+        return views(self._assays, writable=writable)
+
+    def normalisers(self, writable=()):
+        """
+        Returns
+        -------
+        normalisers : list
+            Copy-on-write views of the stored normalisers (see `view`).
+        """
+        return views(self._normalisers, writable=writable)
+
+    def version(self):
+        """
+        Returns
+        -------
+        version : int
+            The version of the stored data.
+        """
+        return self._version
+
+    def __len__(self):
+        return len(self._assays) + len(self._normalisers)
@@ -0,0 +1,154 @@
+"""
+This module defines the StageGraph that allows Qupid to only recompute those parts
+of an analysis whose inputs actually changed.
+
+An analysis is split into stages (e.g. filter -> calibrate -> analyse -> normalise -> ...).
+Each stage is a function of the outputs of its upstream stages and of the session parameters it reads.
+The StageGraph memorises the last output of each stage together with a key (a fingerprint of the
+keys of its inputs and its parameters). Re-running a stage with the same inputs and parameters simply
+returns the memorised output. Since the key of a stage's output is part of the key of any downstream stage,
+changing a parameter invalidates exactly that stage and everything downstream of it.
+
+Note
+----
+Stage functions must not modify their inputs (these are the memorised outputs of other stages)
+and must not access the session. Any problems that should be reported to the user are raised as `StageError`.
+"""
+
+from collections import namedtuple
+
+import cache
+
+
+Output = namedtuple("Output", ["key", "value"])
+"""
+The output of a stage, consisting of its `key` and its actual `value`.
+"""
+
+
+class StageError(Exception):
+    """
+    An error raised within a stage that should be reported to the user.
+    """
+    pass
+
+
+class StageGraph:
+    """
+    Runs the stages of an analysis and memorises the last output of each stage.
+    """
+
+    def __init__(self):
+        self._memo = {}
+        self._computed = []
+
+    def source(self, name, value, version):
+        """
+        Sets up a data source (i.e. a stage without inputs).
+
+        Parameters
+        ----------
+        name : str
+            The name of the source.
+        value
+            The source data.
+        version
+            Any identifier of the current state of the source data.
+
+        Returns
+        -------
+        output : Output
+            The output of the source.
+        """
+        key = cache.fingerprint(name, version)
+        return Output(key, value)
+
+    def run(self, name, func, *inputs, options=None, profiler=None, **params):
+        """
+        Runs a stage if its inputs or parameters changed since it last ran, or returns its memorised output.
+
+        Parameters
+        ----------
+        name : str
+            The name of the stage.
+        func : callable
+            The stage function. It is called as `func(*values, **options, **params)` using the
+            values of the inputs.
+        *inputs : Output
+            The outputs of upstream stages.
+        options : dict
+            Any additional keyword arguments for the stage function that do not affect its output
+            (e.g. the number of workers to use). These are not part of the stage's key.
+        profiler : profiling.Profiler
+            A Profiler to record the stage (if it is actually computed).
+        **params
+            The parameters of the stage.
+
+        Returns
+        -------
+        output : Output
+            The output of the stage.
+        """
+        key = self._key(name, inputs, params)
+
+        memo = self._memo.get(name)
+        if memo is not None and memo.key == key:
+            return memo
+
+        options = {} if options is None else options
+        values = [i.value for i in inputs]
+        if profiler is None:
+            value = func(*values, **options, **params)
+        else:
+            with profiler.profile(name):
+                value = func(*values, **options, **params)
+
+        output = Output(key, value)
+        self._memo[name] = output
+        self._computed.append(name)
+        return output
+
+    def output(self, name):
+        """
+        Returns
+        -------
+        output : Output
+            The memorised output of a stage (or None if the stage has not run yet).
+        """
+        return self._memo.get(name)
+
+    def computed(self, reset=False):
+        """
+        Returns
+        -------
+        computed : list
+            The names of the stages that were actually (re-)computed
+            since the last reset (in the order they were computed).
+        """
+        computed = list(self._computed)
+        if reset:
+            self._computed = []
+        return computed
+
+    def clear(self):
+        """
+        Forgets all memorised outputs.
+        """
+        self._memo = {}
+        self._computed = []
+
+    def _key(self, name, inputs, params):
+        """
+        Generates the key of a stage from the keys of its inputs and its parameters.
+        """
+        params = {i: self._keyable(j) for i, j in params.items()}
+        return cache.fingerprint(name, *(i.key for i in inputs), **params)
+
+    @staticmethod
+    def _keyable(value):
+        """
+        Uploaded files are represented by the digest of their contents (rather than their repr).
+        """
+        if hasattr(value, "getvalue"):
+            return cache.fingerprint(memoryview(value.getvalue()))
+        return value
@@ -0,0 +1,161 @@
+"""
+This module defines the large-data preview of Delta-Delta-Ct results.
+
+Interactive (plotly) figures embed every single datapoint they show, so previews of results with hundreds of assays
+and many replicates become too large to be handled by the browser. Above a number of datapoints (`point_threshold`) the
+preview therefore only shows the precomputed summaries of each group of replicates (from `qpcr.Results.stats`, complemented
+by the quartiles and the range of each group), which are independent of the number of replicates. The full resolution
+of single assays is still available on demand (see `subset`).
+
+Note
+----
+The threshold can be set through the QUPID_PREVIEW_POINTS environment variable.
+"""
+
+import os
+
+import plotly.graph_objects as go
+import qpcr.defaults as defaults
+
+import snapshot
+
+point_threshold = int(os.environ.get("QUPID_PREVIEW_POINTS", 20000))
+
+
+def n_points(results):
+    """
+    Parameters
+    ----------
+    results : qpcr.Results
+        The results.
+
+    Returns
+    -------
+    n : int
+        The number of (non-missing) datapoints of all assays.
+    """
+    df = results.get()
+    return int(df[results.data_cols].count().sum())
+
+
+def is_large(results, threshold=None):
+    """
+    Checks if results have too many datapoints for a full-resolution interactive preview.
+
+    Parameters
+    ----------
+    results : qpcr.Results
+        The results.
+    threshold : int
+        The maximum number of datapoints (default is `point_threshold`).
+
+    Returns
+    -------
+    large : bool
+        True if the results have more datapoints than the threshold.
+    """
+    threshold = point_threshold if threshold is None else threshold
+    return n_points(results) > threshold
+
+
+def summarise(results):
+    """
+    Summarises each group of replicates of each assay.
+
+    Parameters
+    ----------
+    results : qpcr.Results
+        The results.
+
+    Returns
+    -------
+    summary : pd.DataFrame
+        The `group`, `group_name`, `assay`, `n`, `mean`, `stdev`, `median`, lower and upper quartiles (`q1`, `q3`)
+        and the range (`min`, `max`) of each group of each assay.
+    """
+    stats = results.stats()[["group", "group_name", defaults.dataset_header, "n", "mean", "stdev", "median"]]
+
+    # the quartiles and range of all groups of all assays are computed at once
+    df = results.get()
+    values = df.melt(id_vars=["group"], value_vars=results.data_cols, var_name=defaults.dataset_header, value_name="value")
+    grouped = values.groupby([defaults.dataset_header, "group"])["value"]
+    quantiles = grouped.quantile([0, 0.25, 0.75, 1]).unstack()
+    quantiles.columns = ["min", "q1", "q3", "max"]
+
+    summary = stats.merge(quantiles.reset_index(), on=[defaults.dataset_header, "group"], how="left")
+    return summary.reset_index(drop=True)
+
+
+def summary_figure(summary, subplot_type="Assay", figure_type="Bars"):
+    """
+    Generates an interactive figure of the summaries of replicate groups.
+
+    Parameters
+    ----------
+    summary : pd.DataFrame
+        The summaries (see `summarise`).
+    subplot_type : str
+        Show one trace per `Assay` (with the groups on the x-axis) or one trace per `Group` (with the assays on the x-axis).
+    figure_type : str
+        Show the mean and stdev as `Bars`, or the quartiles, range, mean and stdev as boxes (`Dots`).
+
+    Returns
+    -------
+    fig : go.Figure
+        The figure.
+    """
+    trace_col, x_col = (defaults.dataset_header, "group_name") if subplot_type == "Assay" else ("group_name", defaults.dataset_header)
+
+    fig = go.Figure()
+    for name, df in summary.groupby(trace_col, sort=False):
+        if figure_type == "Bars":
+            trace = go.Bar(x=df[x_col], y=df["mean"], error_y=dict(type="data", array=df["stdev"]), name=str(name))
+        else:
+            trace = go.Box(
+                x=df[x_col],
+                q1=df["q1"],
+                median=df["median"],
+                q3=df["q3"],
+                lowerfence=df["min"],
+                upperfence=df["max"],
+                mean=df["mean"],
+                sd=df["stdev"],
+                name=str(name),
+            )
+        fig.add_trace(trace)
+
+    n = int(summary["n"].sum())
+    fig.update_layout(
+        barmode="group",
+        boxmode="group",
+        title=f"Summaries of {len(summary)} replicate groups ({n} values)",
+        yaxis_title="Delta-Delta-Ct",
+    )
+    return fig
+
+
+def subset(results, assays):
+    """
+    Gets a view of the results that only contains some assays.
+
+    Parameters
+    ----------
+    results : qpcr.Results
+        The results.
+    assays : list
+        The (data column) names of the assays to keep.
+
+    Returns
+    -------
+    view : qpcr.Results
+        A view of the results with only the given assays (see `snapshot.view`).
+    """
+    new = snapshot.view(results)
+    setup_cols = [i for i in new.get().columns if i in defaults.setup_cols]
+    new._df = new._df[setup_cols + list(assays)]
+
+    # the summary statistics are only kept for the remaining assays
+    stats = new._stats_df
+    if len(stats) != 0:
+        new._stats_df = stats[stats[defaults.dataset_header].isin(assays)]
+    return new
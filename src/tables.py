@@ -0,0 +1,105 @@
+"""
+This module handles the (server-side) paging of large tables.
+
+Rather than sending complete tables to the browser (which stalls the page for results of hundreds of assays),
+the tables are filtered, sorted, and split into pages here, and only the rows of the current page are displayed.
+"""
+
+import math
+
+import numpy as np
+
+# the available numbers of rows per page
+page_sizes = (25, 50, 100, 250)
+
+
+def filter_rows(df, text):
+    """
+    Keeps only the rows that contain a text in any of their columns.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The table.
+    text : str
+        The text to search for (case-insensitive). If empty, all rows are kept.
+
+    Returns
+    -------
+    df : pd.DataFrame
+        The matching rows.
+    """
+    if not text:
+        return df
+
+    mask = np.zeros(len(df), dtype=bool)
+    for col in df.columns:
+        mask |= df[col].astype(str).str.contains(text, case=False, regex=False).to_numpy()
+    return df[mask]
+
+
+def sort_rows(df, by=None, descending=False):
+    """
+    Sorts the rows of a table by one column.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The table.
+    by : str
+        The column to sort by. If `None`, the rows keep their order.
+    descending : bool
+        Sort in descending order.
+
+    Returns
+    -------
+    df : pd.DataFrame
+        The sorted rows.
+    """
+    if by is None or by not in df.columns:
+        return df
+
+    try:
+        return df.sort_values(by, ascending=not descending, kind="mergesort", na_position="last")
+    # columns of mixed types are sorted by their text (by position, since the index may have duplicates)
+    except TypeError:
+        values = df[by].astype(str).to_numpy()
+        if descending:
+            # (sorting the reversed values keeps equal values in their order)
+            order = len(values) - 1 - np.argsort(values[::-1], kind="mergesort")[::-1]
+        else:
+            order = np.argsort(values, kind="mergesort")
+        return df.iloc[order]
+
+
+def n_pages(rows, size):
+    """
+    Returns
+    -------
+    pages : int
+        The number of pages of `size` rows that hold a number of rows (at least 1).
+    """
+    return max(1, math.ceil(rows / size))
+
+
+def page(df, number, size):
+    """
+    Gets a single page of a table.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        The table.
+    number : int
+        The number of the page (starting at 1).
+    size : int
+        The number of rows per page.
+
+    Returns
+    -------
+    page : pd.DataFrame
+        The rows of the page.
+    """
+    number = min(max(1, number), n_pages(len(df), size))
+    start = (number - 1) * size
+    return df.iloc[start : start + size]
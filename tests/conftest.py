@@ -0,0 +1,8 @@
+"""
+The tests import Qupid's modules just like the app does (from within `src`).
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
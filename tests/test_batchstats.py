@@ -0,0 +1,57 @@
+"""
+Tests that the batched statistical tests (`batchstats`) match the tests of `qpcr.stats`.
+"""
+
+from copy import deepcopy
+
+import numpy as np
+import pandas as pd
+import pytest
+import qpcr
+import qpcr.stats
+
+import batchstats
+
+
+def make_results(missing=False):
+    """
+    Generates the Delta-Delta-Ct results of three assays (of five groups) against a normaliser.
+    """
+    rng = np.random.default_rng(1)
+
+    def make_assay(name):
+        df = pd.DataFrame({"id": [f"g{i // 3}" for i in range(15)], "Ct": rng.uniform(15, 30, 15)})
+        return qpcr.Analyser().pipe(qpcr.Assay(df=df, id=name, replicates=3))
+
+    normaliser = qpcr.Normaliser()
+    normaliser.link(assays=[make_assay(i) for i in ("a1", "a2", "a3")], normalisers=[make_assay("n1")])
+    normaliser.normalise()
+    results = normaliser.get()
+
+    if missing:
+        results._df.iloc[0, 3] = np.nan
+        results._df.iloc[4, 4] = np.nan
+    return results
+
+
+def compare(test, results, **kwargs):
+    expected = getattr(qpcr.stats, test)(deepcopy(results), **kwargs).to_df().reset_index(drop=True)
+    computed = getattr(batchstats, test)(deepcopy(results), **kwargs).to_df().reset_index(drop=True)
+    pd.testing.assert_frame_equal(computed, expected, check_dtype=False, rtol=1e-6)
+
+
+@pytest.mark.parametrize("missing", [False, True])
+@pytest.mark.parametrize("test", ["assaywise_ttests", "groupwise_ttests"])
+def test_ttests(test, missing):
+    compare(test, make_results(missing))
+
+
+@pytest.mark.parametrize("test", ["assaywise_anova", "groupwise_anova"])
+def test_anova(test):
+    # (qpcr.stats does not omit missing values in the ANOVA, so only complete results are compared)
+    compare(test, make_results())
+
+
+def test_selected_pairs():
+    results = make_results()
+    compare("assaywise_ttests", results, groups=[("g0", "g1"), ("g2", "g4")])
@@ -0,0 +1,68 @@
+"""
+Tests that the batched calibration (`calibration.pipe`) matches `qpcr.Calibrator.pipe`.
+"""
+
+from copy import deepcopy
+
+import numpy as np
+import pandas as pd
+import qpcr
+
+import calibration
+
+
+def make_assays():
+    """
+    Generates five assays with a dilution series of calibrator replicates (and two groups).
+    """
+    rng = np.random.default_rng(3)
+    assays = []
+    for i in range(5):
+        ids, cts = [], []
+        for dilution in (1, 2, 4, 8):
+            for _ in range(3):
+                ids.append(f"calibrator: mix: {dilution}")
+                cts.append(20 + np.log2(dilution) * rng.uniform(0.9, 1.1) + rng.normal(0, 0.1))
+        for group in ("g0", "g1"):
+            ids.extend([group] * 3)
+            cts.extend(rng.uniform(20, 25, 3))
+        assays.append(qpcr.Assay(df=pd.DataFrame({"id": ids, "Ct": cts}), id=f"a{i}", replicates=3))
+    return assays
+
+
+def test_pipe():
+    assays = make_assays()
+
+    piped, batched = qpcr.Calibrator(), qpcr.Calibrator()
+    expected = [piped.pipe(deepcopy(i)) for i in assays]
+    computed = calibration.pipe(batched, [deepcopy(i) for i in assays])
+
+    # the same efficiencies are computed and the calibrators are removed
+    assert batched._eff_dict == piped._eff_dict
+    for a, b in zip(computed, expected):
+        assert a.efficiency() == b.efficiency()
+        pd.testing.assert_frame_equal(a.get(), b.get())
+
+    # and the same regression lines are recorded
+    assert batched._computed_values.keys() == piped._computed_values.keys()
+    fields = ("slope", "intercept", "rvalue", "pvalue", "stderr", "intercept_stderr")
+    for key, value in piped._computed_values.items():
+        expected_line = [getattr(value._model, i) for i in fields]
+        computed_line = [getattr(batched._computed_values[key]._model, i) for i in fields]
+        np.testing.assert_allclose(computed_line, expected_line)
+
+
+def test_assign():
+    assays = make_assays()
+    efficiencies = {"a0": 0.95, "a3": 1.05}
+
+    piped, batched = qpcr.Calibrator(), qpcr.Calibrator()
+    piped.adopt(dict(efficiencies))
+    batched.adopt(dict(efficiencies))
+    expected = [piped.pipe(deepcopy(i)) for i in assays]
+    computed = calibration.pipe(batched, [deepcopy(i) for i in assays])
+
+    # known efficiencies are assigned (and only the others are computed)
+    assert batched._eff_dict == piped._eff_dict
+    assert [i.efficiency() for i in computed] == [i.efficiency() for i in expected]
+    assert batched._computed_values.keys() == piped._computed_values.keys()
@@ -0,0 +1,97 @@
+"""
+Tests the command line interface on a small experiment (a decorated vertical big table).
+"""
+
+import numpy as np
+import pandas as pd
+
+import cli
+
+
+def write_experiment(directory, settings=None):
+    """
+    Writes a big table with calibrator replicates and a session log (as downloaded from the app).
+
+    Returns
+    -------
+    log : str
+        The path to the session log.
+    """
+    rng = np.random.default_rng(1)
+    rows = []
+    for assay, decorator in [("actin", "normaliser"), ("gapdh", "assay"), ("il6", "assay")]:
+        start = rng.uniform(20, 26)
+        for group, shift in [("ctrl", 0), ("treated", 1)]:
+            rows.extend((group, start + shift + rng.normal(0, 0.3), assay, decorator) for _ in range(3))
+        for dilution in (1, 0.5, 0.25, 0.125):
+            rows.extend((f"calibrator: dilution: {dilution}", start - 2 - np.log2(dilution) + rng.normal(0, 0.1), assay, decorator) for _ in range(3))
+
+    df = pd.DataFrame(rows, columns=["Sample", "Ct", "Gene", "@qpcr"])
+    df.to_csv(directory / "table.csv", sep=";", index=False)
+
+    log = {
+        "upload_type": "big table",
+        "kind": "vertical",
+        "assay_files": "UploadedFile(id=1, name='table.csv', type='text/csv', size=1)",
+        "delimiter": ";",
+        "id_col": "Sample",
+        "ct_col": "Ct",
+        "assay_col": "Gene",
+        "replicates": "3",
+        "names": "None",
+        "filter_type": "None",
+        "chart_mode": "static",
+        "perform_calibration": "True",
+        "efficiency_reference_file": "None",
+        "use_efficiency_store": "False",
+        "calibration_dilution": "None",
+        "remove_calibrators": "True",
+        "ignore_uncalibratable": "True",
+        "anchor": "grouped",
+        "ref_group": "None",
+        "normalisation_mode": "pair-wise",
+        "drop_rel": "False",
+        "perform_stats_tests": "False",
+    }
+    log.update(settings or {})
+    filename = directory / "experiment.json"
+    filename.write_text("{\n" + ",\n".join(f'\t"{key}" : "{value}"' for key, value in log.items()) + "\n}")
+    return str(filename)
+
+
+def test_calibration(tmp_path):
+    log = write_experiment(tmp_path)
+    assert cli.main([log, "-i", str(tmp_path), "-o", str(tmp_path / "out"), "-p", "1"]) == 0
+
+    results = tmp_path / "out" / "experiment"
+    efficiencies = pd.read_csv(results / "efficiencies.csv")
+    assert sorted(efficiencies["index"]) == ["actin", "gapdh", "il6"]
+    assert efficiencies["eff"].between(0.9, 1.1).all()
+
+    # the calibrators are removed after calibration
+    summary = pd.read_csv(results / "results_summary.csv")
+    assert sorted(summary["group_name"].unique()) == ["ctrl", "treated"]
+
+
+def test_decode():
+    # string settings remain strings, even if they look like python literals
+    assert cli._decode("id_col", "1") == "1"
+    assert cli._decode("sheet_name", "2020") == "2020"
+    assert cli._decode("assay_pattern", "True") == "True"
+    assert cli._decode("primer_set", "None") is None
+    assert cli._decode("names", "['1', 'b']") == ["1", "b"]
+
+    # other settings are converted back to python objects
+    assert cli._decode("replicates", "(3, 3, 2)") == (3, 3, 2)
+    assert cli._decode("replicates", "4:5,1") == "4:5,1"
+    assert cli._decode("inclusion_range", "(-1.0, 1.0)") == (-1.0, 1.0)
+    assert cli._decode("permutate_stack", "20") == 20
+    assert cli._decode("perform_calibration", "True") is True
+    assert cli._decode("ref_group", "0") == "0"
+
+
+def test_read_failure(tmp_path):
+    # the table has no column "Target", so no assays can be read
+    log = write_experiment(tmp_path, {"upload_type": "multi assay", "col": "'Target'"})
+    summary = cli.run_experiment(log, str(tmp_path), str(tmp_path / "out"))
+    assert "StopError: No assays could be identified" in summary["error"]
@@ -0,0 +1,56 @@
+"""
+Tests that the batched filtering (`filtering.pipe`) matches `qpcr.Filter.pipe`.
+"""
+
+from copy import deepcopy
+
+import numpy as np
+import pandas as pd
+import pytest
+import qpcr
+
+import filtering
+
+
+def make_assays(missing=False):
+    """
+    Generates four assays (of six groups of four replicates), with some missing Ct values if so specified.
+    """
+    rng = np.random.default_rng(5)
+    assays = []
+    for i in range(4):
+        cts = rng.normal(22, 1.5, 24)
+        if missing and i % 2 == 0:
+            cts[[1, 7]] = np.nan
+        df = pd.DataFrame({"id": [f"g{j // 4}" for j in range(24)], "Ct": cts})
+        assays.append(qpcr.Assay(df=df, id=f"a{i}", replicates=4))
+    return assays
+
+
+@pytest.mark.parametrize("missing", [False, True])
+@pytest.mark.parametrize("Filter", [qpcr.Filters.RangeFilter, qpcr.Filters.IQRFilter])
+def test_pipe(Filter, missing):
+    assays = make_assays(missing)
+
+    piped, batched = Filter(), Filter()
+    piped.plot_params(show=False)
+    batched.plot_params(show=False)
+
+    expected = [piped.pipe(deepcopy(i)) for i in assays]
+    computed = filtering.pipe(batched, [deepcopy(i) for i in assays])
+
+    # the same replicates are filtered out
+    for a, b in zip(computed, expected):
+        pd.testing.assert_frame_equal(a.get(), b.get())
+
+    # and the same filtering stats are recorded
+    pd.testing.assert_frame_equal(
+        batched._filter_stats.reset_index(drop=True),
+        piped._filter_stats.reset_index(drop=True),
+        check_dtype=False,
+    )
+
+
+def test_batchable():
+    assert filtering.batchable(qpcr.Filters.RangeFilter())
+    assert filtering.batchable(qpcr.Filters.IQRFilter())
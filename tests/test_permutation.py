@@ -0,0 +1,83 @@
+"""
+Tests the permutative normalisation (`permutation.PermutativeNormaliser`) against the `qpcr.Normaliser`.
+
+The `qpcr.Normaliser` draws its permutations differently (from a re-seeded global generator),
+so the individual Delta-Delta-Ct values can only be compared where the permutations do not matter.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+import qpcr
+
+import permutation
+
+
+@pytest.fixture(autouse=True)
+def default_seed(monkeypatch):
+    # the permutative mode of the qpcr.Normaliser refers to a seed that is missing from the qpcr defaults
+    monkeypatch.setattr(qpcr.defaults, "default_seed", qpcr.defaults.seed, raising=False)
+
+
+def make_assay(name, cts):
+    df = pd.DataFrame({"id": [f"g{i // 3}" for i in range(len(cts))], "Ct": cts})
+    return qpcr.Analyser().pipe(qpcr.Assay(df=df, id=name, replicates=3))
+
+
+def normalise(normaliser, normaliser_cts, k, replace=False):
+    """
+    Normalises two assays permutatively against a normaliser.
+
+    Returns
+    -------
+    results : pd.DataFrame
+        The Delta-Delta-Ct results.
+    assays : list
+        The assays' data before normalisation.
+    """
+    rng = np.random.default_rng(2)
+    assays = [make_assay(f"a{i}", rng.uniform(18, 28, 12)) for i in range(2)]
+    data = [i.get().copy() for i in assays]
+
+    normaliser.link(assays=assays, normalisers=[make_assay("n1", normaliser_cts)])
+    normaliser.normalise(mode="permutative", k=k, replace=replace)
+    return normaliser.get().get(), data
+
+
+@pytest.mark.parametrize("k", [1, 4])
+def test_same_as_qpcr(k):
+    # with identical normaliser replicates, every permutation gives the same values
+    cts = np.repeat([20.0, 21.0, 22.0, 23.0], 3)
+    expected, _ = normalise(qpcr.Normaliser(), cts, k)
+    computed, _ = normalise(permutation.PermutativeNormaliser(seed=0), cts, k)
+    pd.testing.assert_frame_equal(computed, expected)
+
+
+@pytest.mark.parametrize("replace", [False, True])
+def test_permutations(replace):
+    k = 5
+    cts = np.random.default_rng(4).uniform(18, 28, 12)
+    expected, _ = normalise(qpcr.Normaliser(), cts, k, replace)
+    computed, assays = normalise(permutation.PermutativeNormaliser(seed=0), cts, k, replace)
+
+    # the results are stacked just like by the qpcr.Normaliser
+    assert computed.shape == expected.shape
+    pd.testing.assert_frame_equal(computed.iloc[:, :2], expected.iloc[:, :2])
+
+    # and each value is an assay replicate normalised against a normaliser replicate of the same group
+    normaliser = make_assay("n1", cts).get()
+    for idx, df in enumerate(assays):
+        ratios = df["dCt"].to_numpy()[:, None] / normaliser["dCt"].to_numpy()[None, :]
+        ratios = np.where(df["group"].to_numpy()[:, None] == normaliser["group"].to_numpy()[None, :], ratios, np.nan)
+        column = computed[f"a{idx}_rel_n1"].to_numpy()
+        stacked = permutation.stack_indices(df["group"].to_numpy(), k)
+        for value, row in zip(column, stacked):
+            assert np.isclose(ratios[row], value).any()
+
+        # without replacement, each permutation uses each normaliser replicate exactly once
+        if not replace:
+            for group in range(4):
+                values = column[group * 3 * k : (group + 1) * 3 * k].reshape(k, 3)
+                drawn = np.sort(df["dCt"].to_numpy()[group * 3 : group * 3 + 3] / values, axis=1)
+                expected_drawn = np.sort(normaliser["dCt"].to_numpy()[group * 3 : group * 3 + 3])
+                np.testing.assert_allclose(drawn, np.tile(expected_drawn, (k, 1)))